@@ -50,7 +50,7 @@ if __name__ == "__main__":
 
     sim_numbers = utils.get_range(args.sim_numbers)
 
-    if type(sim_numbers) is int:
+    if isinstance(sim_numbers, int):
         sim_numbers = [sim_numbers]
 
     # Create file path
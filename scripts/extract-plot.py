@@ -12,7 +12,10 @@ import os
 import sys
 import argparse
 
-from symprobe import extract_script_fct, constants
+from symprobe import constants
+
+_ESTRUS_CHOICES = frozenset(constants.ESTRUS + ("all",))
+_METRIC_CHOICES = frozenset({"rmse", "mae", "mse", "vrd"})
 
 
 def add_shared_arguments(parser):
@@ -32,7 +35,7 @@ def add_shared_arguments(parser):
         "--estrus",
         type=str,
         default="all",
-        choices={"proestrus", "estrus", "metestrus", "diestrus", "all"},
+        choices=_ESTRUS_CHOICES,
         help="estrus stage",
     )
     parser.add_argument(
@@ -74,10 +77,10 @@ if __name__ == "__main__":
     resolution_parser.add_argument(
         "metric",
         type=str,
-        choices={"rmse", "mae", "mse", "vrd"},
+        choices=_METRIC_CHOICES,
         help="metric used for comparison",
     )
-    resolution_parser.set_defaults(func=extract_script_fct.resolution_fct)
+    resolution_parser.set_defaults(func="resolution_fct")
 
     # Subcommand: cell
     cell_parser = subparsers.add_parser(
@@ -86,7 +89,7 @@ if __name__ == "__main__":
 
     add_shared_arguments(cell_parser)
 
-    cell_parser.set_defaults(func=extract_script_fct.cell_fct)
+    cell_parser.set_defaults(func="cell_fct")
 
     # Subcommand: parameter
     parameter_parser = subparsers.add_parser(
@@ -104,7 +107,7 @@ if __name__ == "__main__":
     parameter_parser.add_argument(
         "metric",
         type=str,
-        choices={"rmse", "mae", "mse", "vrd"},
+        choices=_METRIC_CHOICES,
         help="metric used for comparison",
     )
 
@@ -115,7 +118,13 @@ if __name__ == "__main__":
         help="name of the estrus specific directory",
     )
 
-    parameter_parser.set_defaults(func=extract_script_fct.parameter_fct)
+    parameter_parser.add_argument(
+        "--no-spikes",
+        action="store_true",
+        help="do not count the spikes propagated to the cervix",
+    )
+
+    parameter_parser.set_defaults(func="parameter_fct")
 
     # Subcommand: comparison
     comparison_parser = subparsers.add_parser(
@@ -126,7 +135,7 @@ if __name__ == "__main__":
     comparison_parser.add_argument(
         "metric",
         type=str,
-        choices={"rmse", "mae", "mse", "vrd"},
+        choices=_METRIC_CHOICES,
         help="metric used for comparison",
     )
     comparison_parser.add_argument(
@@ -148,11 +157,16 @@ if __name__ == "__main__":
         default="short",
     )
 
-    comparison_parser.set_defaults(func=extract_script_fct.comparison_fct)
+    comparison_parser.set_defaults(func="comparison_fct")
 
     # Parse input arguments
     args = parser.parse_args()
 
+    # Only import the data functions and their dependencies once parsed
+    from symprobe import extract_script_fct
+
+    func = getattr(extract_script_fct, args.func)
+
     # Create path to main directory
     dir_path = os.path.join(
         constants.HOME,
@@ -162,7 +176,7 @@ if __name__ == "__main__":
 
     try:
         if args.command == "resolution":
-            args.func(
+            func(
                 dir_path,
                 args.estrus_dir,
                 args.metric,
@@ -172,7 +186,7 @@ if __name__ == "__main__":
                 args.delimiter,
             )
         elif args.command == "cell":
-            args.func(
+            func(
                 dir_path,
                 args.sim_numbers,
                 args.sim_name,
@@ -180,7 +194,7 @@ if __name__ == "__main__":
                 args.delimiter,
             )
         elif args.command == "parameter":
-            args.func(
+            func(
                 dir_path,
                 args.parameter,
                 args.estrus_dir,
@@ -189,9 +203,10 @@ if __name__ == "__main__":
                 args.sim_name,
                 args.estrus,
                 args.delimiter,
+                compute_spikes=not args.no_spikes,
             )
         elif args.command == "comparison":
-            args.func(
+            func(
                 dir_path,
                 args.metric,
                 args.realistic_dir,
@@ -22,9 +22,20 @@ if __name__ == "__main__":
         title="subcommands", description="Available commands", dest="command"
     )
 
+    # Options shared by all subcommands
+    workers_parser = argparse.ArgumentParser(add_help=False)
+    workers_parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=1,
+        help="number of simulations to run at once, default 1",
+    )
+
     # Subcommand: parameter
     param_parser = subparsers.add_parser(
-        "parameter", help="Run a parameter sweep for the given parameter"
+        "parameter",
+        help="Run a parameter sweep for the given parameter",
+        parents=[workers_parser],
     )
     param_parser.add_argument("dim", type=int, help="dimension (2 or 3)")
     param_parser.add_argument("param", type=str, help="parameter to sweep")
@@ -47,7 +58,9 @@ if __name__ == "__main__":
 
     # Subcommand: resolution
     res_parser = subparsers.add_parser(
-        "resolution", help="Run a simulation on different resolution meshes"
+        "resolution",
+        help="Run a simulation on different resolution meshes",
+        parents=[workers_parser],
     )
     res_parser.add_argument("dim", type=int, help="dimension (2 or 3)")
     res_parser.add_argument(
@@ -72,6 +85,7 @@ if __name__ == "__main__":
     estrus_parser = subparsers.add_parser(
         "estrus",
         help="Run an estrus sweep with the same mesh and base parameters",
+        parents=[workers_parser],
     )
     estrus_parser.add_argument("dim", type=int, help="dimension (2 or 3)")
     estrus_parser.set_defaults(func=sweeps.estrus_sweep)
@@ -81,7 +95,13 @@ if __name__ == "__main__":
 
     try:
         if args.command == "resolution":
-            args.func(args.dim, args.mesh_name, args.start_val, args.end_val)
+            args.func(
+                args.dim,
+                args.mesh_name,
+                args.start_val,
+                args.end_val,
+                max_workers=args.max_workers,
+            )
         elif args.command == "parameter":
             args.func(
                 args.dim,
@@ -89,9 +109,10 @@ if __name__ == "__main__":
                 args.start_val,
                 args.end_val,
                 args.step,
+                max_workers=args.max_workers,
             )
         elif args.command == "estrus":
-            args.func(args.dim)
+            args.func(args.dim, max_workers=args.max_workers)
         else:
             parser.print_help()
     except Exception as e:
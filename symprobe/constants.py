@@ -39,12 +39,13 @@ HORN_LENGTH_DICT = {  # Lenght of left horn in mm
     "AWB008_metestrus_mesh": 19,
     "AWB003_diestrus_mesh": 20,
 }
-ESTRUS = ["proestrus", "estrus", "metestrus", "diestrus"]
+ESTRUS = ("proestrus", "estrus", "metestrus", "diestrus")
 
 # Plot constants
 LEFT = 0.22
 BOTTOM = 0.17
 RIGHT = 0.80
+SAVE_DPI = 300  # Resolution of the saved figures
 COLOURS = {
     "proestrus": "r",
     "estrus": "b",
@@ -9,10 +9,18 @@ Author: Mathias Roesler
 Date: 03/25
 """
 
+import io
 import os
 import numpy as np
 
-from symprobe import utils, plots, constants, metrics
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
+
+from symprobe import utils, constants, metrics
+
+MAX_LOAD_THREADS = 8  # Maximum number of simulations loaded concurrently
+LOAD_CHUNKSIZE = 1_000_000  # Number of csv rows parsed at once
 
 
 def _fct_setup(rng, estrus):
@@ -23,40 +31,40 @@ def _fct_setup(rng, estrus):
     estrus -- str, estrus cycle.
 
     Return:
-    nb_sims -- list[int], list of simulation numbers.
-    estrus -- list[str], list of estrus phases.
+    nb_sims -- list[int] or range, simulation numbers.
+    estrus -- list[str] or tuple[str], estrus phases.
 
     Raises:
     ValueError -- if the number of simulations does not match with estrus.
 
     """
-    sim_numbers = utils.get_range(rng)
+    nb_sims = utils.get_range(rng)
 
-    if type(sim_numbers) is type(int()):
+    if isinstance(nb_sims, int):
         if estrus == "all":
             raise ValueError("estrus cannot be all with a single simulation")
 
-        sim_numbers = [sim_numbers]
-
-    if estrus == "all":
-        estrus = constants.ESTRUS
-        nb_sims = sim_numbers
+        nb_sims = [nb_sims]
 
-    else:
-        estrus = [estrus]
-        nb_sims = sim_numbers
+    return nb_sims, constants.ESTRUS if estrus == "all" else [estrus]
 
-    return nb_sims, estrus
 
-
-def _data_extract(sim_name, sim_nb, path, delimiter):
+def _data_extract(sim_name, sim_nb, path, delimiter, dtype=np.float32):
     """Recuperates the extracted data for a simulation
 
+    The csv file is read by chunks, unless its rows are not interleaved.
+    The loaded data is cached next to the csv file and the cache is reused
+    as long as the modification times and sizes of the csv and log files
+    match the ones stored in the cache. The amplitude values are stored in
+    a separate npy file so that they can be memory mapped instead of read
+    in memory, the returned V is then read-only.
+
     Arguments:
     sim_name -- str, simulation name.
     sim_nb -- int, simulation number.
     path -- str, path to the data directory.
     delimiter -- str, csv file delimiter.
+    dtype -- np.dtype, type of the amplitude values, default np.float32.
 
     Return:
     V -- np.array[float], amplitude values of the extracted cells.
@@ -69,29 +77,60 @@ def _data_extract(sim_name, sim_nb, path, delimiter):
 
     """
     current_sim_name = f"{sim_name}_{sim_nb:03}"
+    extract_path = os.path.join(path, "extract", current_sim_name)
 
-    data_path = os.path.join(
-        path,
-        "extract",
-        "{}.csv".format(current_sim_name),
-    )
-    log_path = os.path.join(
-        path,
-        "log",
-        "{}.log".format(current_sim_name),
-    )
+    data_path = f"{extract_path}.csv"
+    # Distinct suffix so that data saved with save_data is never overwritten
+    cache_path = f"{extract_path}.cache.npz"
+    V_cache_path = f"{extract_path}.cache.npy"
+    log_path = os.path.join(path, "log", f"{current_sim_name}.log")
 
     try:
-        V, t, cell_ids = utils.load_data(data_path, log_path, delimiter)
+        cache_key = utils.get_cache_key(data_path, log_path)
+    except OSError:
+        cache_key = None  # Missing sources are reported by load_data
+
+    # The npz file is written last so it must be more recent than the npy
+    if cache_key is not None and utils.is_cache_valid(
+        cache_path, V_cache_path
+    ):
+        with np.load(cache_path) as cache:
+            if "key" in cache and np.array_equal(cache["key"], cache_key):
+                V = np.load(V_cache_path, mmap_mode="r")
+
+                if V.dtype == dtype:
+                    return V, cache["t"], cache["cell_ids"], log_path
+
+    load = partial(utils.load_data, data_path, log_path, delimiter, dtype)
+
+    try:
+        V, t, cell_ids = load(chunksize=LOAD_CHUNKSIZE)
+    except ValueError as e:
+        if "not interleaved" not in str(e):
+            raise e
+
+        # Rows grouped by cell can only be reordered from the whole file
+        V, t, cell_ids = load(chunksize=None)
     except Exception as e:
         raise e
 
+    V = V.astype(dtype, copy=False)
+
+    if cache_key is not None:
+        try:
+            utils.save_cache(V_cache_path, V=V)
+            utils.save_cache(cache_path, t=t, cell_ids=cell_ids, key=cache_key)
+        except OSError:
+            pass  # The cache is optional, e.g. read-only data directory
+
     return V, t, cell_ids, log_path
 
 
 def _reorder_V(V, cell_ids, ordered_ids):
     """Reorders V to follow ovaries, centre, cervical end extract
 
+    The cell ids are assumed to be unique.
+
     Arguments:
     V -- np.array[float], amplitude values of the extracted cells.
     cell_ids -- np.array[int], cell ids (assume only 3 cells extracted).
@@ -102,23 +141,255 @@ def _reorder_V(V, cell_ids, ordered_ids):
 
     Raises:
     ValueError -- if the ordered and unordered ids are not the same length.
+    ValueError -- if an ordered id is missing or repeated.
 
     """
     if len(cell_ids) != len(ordered_ids):
         raise ValueError("cell ids and ordered ids should have same length.")
 
-    if (cell_ids == ordered_ids).all():
-        # Already in order
+    if tuple(cell_ids) == tuple(ordered_ids):
+        # Already in order, avoids building a boolean array for a few ids
         return V
 
-    ordered_V = np.zeros(V.shape)
+    order = np.asarray(ordered_ids)
+    ids = np.asarray(cell_ids)
+
+    # Find the position of each ordered id in the cell ids
+    idx = np.argsort(ids)
+    pos = np.searchsorted(ids, order, sorter=idx)
+    perm = idx[np.minimum(pos, len(ids) - 1)]
+
+    if not np.array_equal(ids[perm], order):
+        missing = np.setdiff1d(order, ids).tolist()
+        raise ValueError(f"ordered ids {missing} not found in cell ids.")
+
+    if np.unique(perm).size != perm.size:
+        raise ValueError("ordered ids should be unique.")
+
+    return V[:, perm]
+
+
+def _ordered_data_extract(
+    sim_name,
+    sim_nb,
+    path,
+    delimiter,
+    dtype=np.float32,
+):
+    """Recuperates the extracted data for a simulation ordered as ovaries,
+    centre, cervical end
+
+    Arguments:
+    sim_name -- str, simulation name.
+    sim_nb -- int, simulation number.
+    path -- str, path to the data directory.
+    delimiter -- str, csv file delimiter.
+    dtype -- np.dtype, type of the amplitude values, default np.float32.
+
+    Return:
+    V -- np.array[float], ordered amplitude values of the extracted cells.
+    t -- np.array[float], timesteps of the extracted cells.
+    mesh_name -- str, name of the mesh used for the simulation.
+    log_path -- str, path to the log file.
+
+    Raises:
+    Exception -- if an error occurs during the recuperation process.
+
+    """
+    try:
+        V, t, cell_ids, log_path = _data_extract(
+            sim_name,
+            sim_nb,
+            path,
+            delimiter,
+            dtype=dtype,
+        )
+        mesh_name = utils.get_mesh_name(log_path)
+        V = _reorder_V(V, cell_ids, constants.PTS_DICT[mesh_name])
+    except Exception as e:
+        raise e
+
+    return V, t, mesh_name, log_path
+
+
+def _check_trace_length(V, data, sim_nb):
+    """Checks that a simulation has as many timesteps as the data array
+
+    Arguments:
+    V -- np.array[float], amplitude values of the extracted cells.
+    data -- np.array[float], data array with one row per simulation.
+    sim_nb -- int, simulation number.
+
+    Return:
+
+    Raises:
+    ValueError -- if the number of timesteps does not match.
+
+    """
+    if len(V) != data.shape[1]:
+        raise ValueError(
+            f"simulation {sim_nb} has {len(V)} timesteps instead of "
+            f"{data.shape[1]}."
+        )
+
+
+def _buffered_stage(stage_fct, stage):
+    """Applies a function to an estrus stage and captures its printed output
+
+    Arguments:
+    stage_fct -- function, function processing a single stage.
+    stage -- str, estrus stage.
+
+    Return:
+    result -- result of stage_fct for the stage.
+    output -- str, text printed while processing the stage.
+
+    Raises:
+    Exception -- if an error occurs while processing the stage.
+
+    """
+    buffer = io.StringIO()
+
+    with redirect_stdout(buffer):
+        result = stage_fct(stage)
+
+    return result, buffer.getvalue()
+
+
+def _map_stages(stage_fct, estrus, **kwargs):
+    """Applies a function to each estrus stage
+
+    The stages are independent and processed in parallel when there is more
+    than one of them. The output printed by each stage is shown in the order
+    of the stages.
+
+    Arguments:
+    stage_fct -- function, function processing a single stage, takes the
+    stage as its first argument.
+    estrus -- list[str] or tuple[str], estrus phases.
+    kwargs -- dict, additional arguments passed to stage_fct.
+
+    Return:
+    results -- list, result of stage_fct for each stage.
+
+    Raises:
+    Exception -- if an error occurs while processing a stage.
+
+    """
+    stage_fct = partial(stage_fct, **kwargs)
+
+    if len(estrus) == 1:
+        return [stage_fct(estrus[0])]
+
+    results = []
+
+    with ProcessPoolExecutor(max_workers=len(estrus)) as executor:
+        for result, output in executor.map(
+            partial(_buffered_stage, stage_fct),
+            estrus,
+        ):
+            print(output, end="")
+            results.append(result)
+
+    return results
+
+
+def _map_sims(extract_fct, nb_sims):
+    """Loads the data of several simulations
+
+    The simulations are loaded in threads to overlap the reading and
+    parsing of the files.
+
+    Arguments:
+    extract_fct -- function, function loading a single simulation, takes
+    the simulation number as its only argument.
+    nb_sims -- list[int], list of simulation numbers.
+
+    Return:
+    results -- list, result of extract_fct for each simulation, in the
+    order of nb_sims.
+
+    Raises:
+    Exception -- if an error occurs while loading a simulation.
+
+    """
+    if len(nb_sims) == 1:
+        return [extract_fct(nb_sims[0])]
+
+    with ThreadPoolExecutor(
+        max_workers=min(MAX_LOAD_THREADS, len(nb_sims))
+    ) as executor:
+        return list(executor.map(extract_fct, nb_sims))
+
+
+def _resolution_stage(
+    stage,
+    dir_path,
+    estrus_dir,
+    metric,
+    nb_sims,
+    sim_name,
+    delimiter,
+):
+    """Computes the comparison metric between resolutions for one stage
+
+    Arguments:
+    stage -- str, estrus stage.
+    dir_path -- str, path to the directory containing the data.
+    estrus_dir -- str, name of the estrus dependant directory.
+    metric -- str, name of the metric used for comparison.
+    nb_sims -- list[int], list of simulation numbers.
+    sim_name -- str, name of the simulation to load data from.
+    delimiter -- str, delimiter in csv file.
+
+    Returns:
+    comp_data -- np.array[float], comparison metric between each mesh and
+    the next one.
+    nb_mesh_eles -- np.array[float], number of elements of each mesh.
+
+    Raises:
+    Exception -- if an error occurs while extracting the data.
+
+    """
+    estrus_path = os.path.join(dir_path, stage + "_" + estrus_dir)
+
+    try:
+        sims_data = _map_sims(
+            partial(
+                _data_extract,
+                sim_name,
+                path=estrus_path,
+                delimiter=delimiter,
+            ),
+            nb_sims,
+        )
+    except Exception as e:
+        raise e
+
+    # Allocate space for data once all sims are loaded, one row per sim
+    data = np.empty(
+        (len(nb_sims), len(sims_data[0][0])),
+        dtype=sims_data[0][0].dtype,
+    )
+    nb_mesh_eles = np.zeros(len(nb_sims))
 
-    for i, ordered_id in enumerate(ordered_ids):
-        for j, id in enumerate(cell_ids):
-            if id == ordered_id:
-                ordered_V[:, i] = V[:, j]
+    for i, (sim_nb, (V, t, _, log_path)) in enumerate(zip(nb_sims, sims_data)):
+        # Iterate over each simulation
+        _check_trace_length(V, data, sim_nb)
 
-    return ordered_V
+        data[i] = V[:, 0]
+        nb_mesh_eles[i] = constants.RES_DICT[utils.get_mesh_name(log_path)]
+
+    comp_data = np.zeros(len(nb_sims))
+    comp_data[:-1] = metrics.compute_comparison_batch(
+        data[:-1],
+        data[1:],
+        metric,
+        time=t if metric == "vrd" else None,
+    )
+    comp_data[-1] = 0.0  # Comparing finest mesh with itself
+
+    return comp_data, nb_mesh_eles
 
 
 def resolution_fct(
@@ -150,48 +421,22 @@ def resolution_fct(
     """
     nb_sims, estrus = _fct_setup(rng, estrus)
 
-    comp_dict = {}  # Create a dictionnary for the data of each stage
-
-    for stage in estrus:
-        estrus_path = os.path.join(dir_path, stage + "_" + estrus_dir)
-
-        for i, sim_nb in enumerate(nb_sims):
-            # Iterate over each simulation
-            try:
-                V, t, _, log_path = _data_extract(
-                    sim_name,
-                    sim_nb,
-                    estrus_path,
-                    delimiter,
-                )
-            except Exception as e:
-                raise e
-
-            if i == 0:
-                # Allocate space for data on the first loop
-                data = np.zeros((len(V), len(nb_sims)))
-                nb_mesh_eles = np.zeros(len(nb_sims))
-
-            data[:, i] = V[:, 0]
-            nb_mesh_eles[i] = constants.RES_DICT[utils.get_mesh_name(log_path)]
-
-        comp_data = np.zeros(len(nb_sims))
+    results = _map_stages(
+        _resolution_stage,
+        estrus,
+        dir_path=dir_path,
+        estrus_dir=estrus_dir,
+        metric=metric,
+        nb_sims=nb_sims,
+        sim_name=sim_name,
+        delimiter=delimiter,
+    )
 
-        for i in range(len(nb_sims) - 1):
-            comp_data[i] = metrics.compute_comparison(
-                data[:, i],
-                data[:, i + 1],
-                metric,
-                time=t,
-            )
+    # Create a dictionnary for the data of each stage
+    comp_dict = {stage: res[0] for stage, res in zip(estrus, results)}
+    nb_mesh_eles = results[-1][1]
 
-        comp_data[len(nb_sims) - 1] = metrics.compute_comparison(
-            data[:, len(nb_sims) - 1],
-            data[:, len(nb_sims) - 1],
-            metric,
-            time=t,
-        )
-        comp_dict[stage] = comp_data  # Add data to the estrus dict
+    from symprobe import plots  # Only import matplotlib when plotting
 
     plots.plot_resolution_convergence(comp_dict, nb_mesh_eles, metric)
 
@@ -215,33 +460,121 @@ def cell_fct(dir_path, rng, sim_name, estrus, delimiter):
     """
     nb_sims, estrus = _fct_setup(rng, estrus)
 
+    from symprobe import plots  # Only import matplotlib when plotting
+
     for i, sim_num in enumerate(nb_sims):
         try:
-            V, t, cell_ids, log_path = _data_extract(
+            V, t, mesh_name, _ = _ordered_data_extract(
                 sim_name,
                 sim_num,
                 dir_path,
                 delimiter,
             )
 
-            ordered_ids = constants.PTS_DICT[utils.get_mesh_name(log_path)]
-
-            V = _reorder_V(V, cell_ids, ordered_ids)
-
             try:
-                utils.estimate_velocity(V, t, utils.get_mesh_name(log_path))
+                utils.estimate_velocity(V, t, mesh_name)
             except ValueError as e:
                 print(f"Warning: {e}")
 
-            if type(estrus) is type(list()):
-                plots.plot_cell_data(V, t, estrus=estrus[i])
-            else:
-                plots.plot_cell_data(V, t, estrus=estrus)
+            # A single stage is shared by all the simulations
+            stage = estrus[i] if len(estrus) > 1 else estrus[0]
+            plots.plot_cell_data(
+                V, t, estrus=stage, name=f"cell_data_{stage}_{sim_num:03}"
+            )
 
         except Exception as e:
             raise e
 
 
+def _parameter_stage(
+    stage,
+    dir_path,
+    parameter,
+    estrus_dir,
+    metric,
+    nb_sims,
+    sim_name,
+    delimiter,
+    compute_spikes,
+):
+    """Computes the comparison metric and number of spikes propagated to the
+    cervix for one stage
+
+    Arguments:
+    stage -- str, estrus stage.
+    dir_path -- str, path to the directory containing the data.
+    paramter -- str, name of the parameter changed.
+    estrus_dir -- str, name of the estrus dependant directory.
+    metric -- str, name of the metric used for comparison.
+    nb_sims -- list[int], list of simulation numbers.
+    sim_name -- str, name of the simulation to load data from.
+    delimiter -- str, delimiter in csv file.
+    compute_spikes -- bool, if True count the spikes propagated to the cervix.
+
+    Returns:
+    comp_data -- np.array[float], comparison metric between each simulation
+    and the first one.
+    nb_spikes -- np.array[float], number of spikes propagated to the cervix,
+    None if compute_spikes is False.
+    param_values -- np.array[float], value of the parameter.
+
+    Raises:
+    Exception -- if an error occurs while extracting the data.
+
+    """
+    estrus_path = os.path.join(dir_path, stage + "_" + estrus_dir)
+    print(f"Estrus stage: {stage}")
+
+    try:
+        sims_data = _map_sims(
+            partial(
+                _ordered_data_extract,
+                sim_name,
+                path=estrus_path,
+                delimiter=delimiter,
+            ),
+            nb_sims,
+        )
+    except Exception as e:
+        raise e
+
+    # Allocate space for data once all sims are loaded, one row per sim
+    data = np.empty(
+        (len(nb_sims), len(sims_data[0][0])),
+        dtype=sims_data[0][0].dtype,
+    )
+    param_values = np.zeros(len(nb_sims))
+    nb_spikes = np.zeros(len(nb_sims)) if compute_spikes else None
+
+    for i, (sim_nb, (V, t, mesh_name, log_path)) in enumerate(
+        zip(nb_sims, sims_data)
+    ):
+        # Iterate over each simulation
+        _check_trace_length(V, data, sim_nb)
+
+        data[i] = V[:, 0]
+        param_values[i] = utils.get_param_value(log_path, parameter)
+
+        if compute_spikes:
+            nb_spikes[i] = len(utils.extract_spike_times(V[:, 2], t))
+
+        try:
+            utils.estimate_velocity(V, t, mesh_name)
+        except ValueError as e:
+            print(f"Warning: {e}")
+
+    comp_data = np.zeros(len(nb_sims))
+    comp_data[1:] = metrics.compute_comparison_batch(
+        data[1:],
+        data[0],
+        metric,
+        time=t if metric == "vrd" else None,
+    )
+    comp_data[0] = 0.0  # Comparing inital state with initial state
+
+    return comp_data, nb_spikes, param_values
+
+
 def parameter_fct(
     dir_path,
     parameter,
@@ -251,6 +584,7 @@ def parameter_fct(
     sim_name,
     estrus,
     delimiter,
+    compute_spikes=True,
 ):
     """Plots the metric and number of spike propagated to the cervix
     for simulations with different values of a give parameter
@@ -264,6 +598,8 @@ def parameter_fct(
     sim_name -- str, name of the simulation to load data from.
     estrus -- str, estrus cycle {proestrus, estrus, metestrus, diestrus, all}.
     delimiter -- str, delimiter in csv file.
+    compute_spikes -- bool, if True count and plot the number of spikes
+    propagated to the cervix, default value True.
 
     Returns:
 
@@ -274,58 +610,30 @@ def parameter_fct(
     """
     nb_sims, estrus = _fct_setup(rng, estrus)
 
-    comp_dict = {}  # Create a dictionnary for the data of each stage
-    spike_dict = {}  # Create a dictionnary for spike propagation of each stage
-
-    for stage in estrus:
-        estrus_path = os.path.join(dir_path, stage + "_" + estrus_dir)
-        print(f"Estrus stage: {stage}")
-        for i, sim_nb in enumerate(nb_sims):
-            # Iterate over each simulation
-            try:
-                V, t, cell_ids, log_path = _data_extract(
-                    sim_name,
-                    sim_nb,
-                    estrus_path,
-                    delimiter,
-                )
-                ordered_ids = constants.PTS_DICT[utils.get_mesh_name(log_path)]
-
-                V = _reorder_V(V, cell_ids, ordered_ids)
-            except Exception as e:
-                raise e
-
-            if i == 0:
-                # Allocate space for data on the first loop
-                data = np.zeros((len(V), len(nb_sims)))
-                param_values = np.zeros(len(nb_sims))
-                nb_spikes = np.zeros(len(nb_sims))
-
-            data[:, i] = V[:, 0]
-            param_values[i] = utils.get_param_value(log_path, parameter)
-            nb_spikes[i] = len(utils.extract_spike_times(V[:, 2], t))
-
-            try:
-                utils.estimate_velocity(V, t, utils.get_mesh_name(log_path))
-            except ValueError as e:
-                print(f"Warning: {e}")
+    results = _map_stages(
+        _parameter_stage,
+        estrus,
+        dir_path=dir_path,
+        parameter=parameter,
+        estrus_dir=estrus_dir,
+        metric=metric,
+        nb_sims=nb_sims,
+        sim_name=sim_name,
+        delimiter=delimiter,
+        compute_spikes=compute_spikes,
+    )
 
-        comp_data = np.zeros(len(nb_sims))
+    # Create dictionnaries for the data and spike propagation of each stage
+    comp_dict = {stage: res[0] for stage, res in zip(estrus, results)}
+    spike_dict = {stage: res[1] for stage, res in zip(estrus, results)}
+    param_values = results[-1][2]
 
-        for i in range(1, len(nb_sims)):
-            comp_data[i] = metrics.compute_comparison(
-                data[:, i],
-                data[:, 0],
-                metric,
-                time=t,
-            )
-
-        comp_data[0] = 0.0  # Comparing inital state with initial state
-        comp_dict[stage] = comp_data  # Add data to the estrus dict
-        spike_dict[stage] = nb_spikes  # Add number of spike to estrus dict
+    from symprobe import plots  # Only import matplotlib when plotting
 
     plots.plot_parameter_comparison(comp_dict, param_values, metric, parameter)
-    plots.plot_spike_propagation(spike_dict, param_values, parameter)
+
+    if compute_spikes:
+        plots.plot_spike_propagation(spike_dict, param_values, parameter)
 
 
 def comparison_fct(
@@ -365,61 +673,44 @@ def comparison_fct(
     """
     nb_sims, estrus = _fct_setup(rng, estrus)
 
-    for i, sim_num in enumerate(nb_sims):
-        stage = estrus[i]
+    idealised_path = os.path.join(dir_path, idealised_dir, sub_dir)
+    realistic_path = os.path.join(dir_path, realistic_dir, sub_dir)
 
-        idealised_path = os.path.join(dir_path, idealised_dir, sub_dir)
-        realistic_path = os.path.join(dir_path, realistic_dir, sub_dir)
-        comp_data = []
+    from symprobe import plots  # Only import matplotlib when plotting
+
+    for i, sim_num in enumerate(nb_sims):
+        # A single stage is shared by all the simulations
+        stage = estrus[i] if len(estrus) > 1 else estrus[0]
 
         try:
-            # Get idealised mesh data
-            idealised_V, t, ideal_ids, idealised_log_path = _data_extract(
+            # Get idealised and realistic mesh data as ova, cen, cvx
+            idealised_V, t, _, _ = _ordered_data_extract(
                 sim_name,
                 sim_num,
                 idealised_path,
                 delimiter,
             )
-            ideal_ordered_ids = constants.PTS_DICT[
-                utils.get_mesh_name(idealised_log_path)
-            ]
-
-            idealised_V = _reorder_V(  # Reorder to be ova, cen, cvx
-                idealised_V,
-                ideal_ids,
-                ideal_ordered_ids,
-            )
-
-            # Get realistic mesh data
-            realistic_V, t, real_ids, realistic_log_path = _data_extract(
+            realistic_V, t, _, _ = _ordered_data_extract(
                 sim_name,
                 sim_num,
                 realistic_path,
                 delimiter,
             )
-            real_ordered_ids = constants.PTS_DICT[
-                utils.get_mesh_name(realistic_log_path)
-            ]
-
-            realistic_V = _reorder_V(  # Reorder to be ova, cen, cvx
-                realistic_V,
-                real_ids,
-                real_ordered_ids,
-            )
 
         except Exception as e:
             raise e
 
         print(f"{stage.capitalize()}")
+
+        # Compare all cells at once, one row per cell
+        comp_data = metrics.compute_comparison_batch(
+            idealised_V.T,
+            realistic_V.T,
+            metric,
+            time=t if metric == "vrd" else None,
+        )
+
         for j in range(idealised_V.shape[1]):
-            comp_data.append(
-                metrics.compute_comparison(
-                    idealised_V[:, j],
-                    realistic_V[:, j],
-                    metric,
-                    time=t,
-                )
-            )
             print(f"  {comp_data[j]:.3f}")
 
             try:
@@ -428,6 +719,7 @@ def comparison_fct(
                     realistic_V[:, j],
                     t,
                     estrus=stage,
+                    name=f"cell_comparison_{stage}_{sim_num:03}_{j}",
                 )
             except ValueError as e:
                 raise e
@@ -12,8 +12,6 @@ import symprobe.utils
 
 import numpy as np
 
-from elephant.spike_train_dissimilarity import van_rossum_distance
-
 
 def check_broadcasting(y_true, y_pred):
     """Checks if the arrays are broadcastable
@@ -28,6 +26,9 @@ def check_broadcasting(y_true, y_pred):
     ValueError -- if the arrays are not broadcastable
 
     """
+    if np.shape(y_true) == np.shape(y_pred):
+        return  # Same shapes always broadcast
+
     try:
         # Check broadcasting compatibility
         np.broadcast_arrays(y_true, y_pred)
@@ -35,6 +36,22 @@ def check_broadcasting(y_true, y_pred):
         raise e
 
 
+def _mean_square(diff):
+    """Computes the mean of the squared values of an array
+
+    The squares are summed with a dot product to avoid allocating a
+    temporary array.
+
+    Arguments:
+    diff -- np.array, difference between two arrays.
+
+    Return:
+    mean_square -- float, mean of the squared values.
+
+    """
+    return np.vdot(diff, diff) / np.size(diff)
+
+
 def compute_rmse(y_true, y_pred):
     """Computes the root mean square error between two arrays
 
@@ -43,6 +60,7 @@ def compute_rmse(y_true, y_pred):
     y_pred -- np.array, predicted values.
 
     Return:
+    rmse -- float, root mean square error.
 
     Raises:
     ValueError -- if the arrays are not broadcastable
@@ -53,7 +71,7 @@ def compute_rmse(y_true, y_pred):
         check_broadcasting(y_true, y_pred)
     except ValueError as e:
         raise e
-    return np.sqrt(np.mean((y_true - y_pred) ** 2))
+    return float(np.sqrt(_mean_square(y_true - y_pred)))
 
 
 def compute_mae(y_true, y_pred):
@@ -64,6 +82,7 @@ def compute_mae(y_true, y_pred):
     y_pred -- np.array, predicted values.
 
     Return:
+    mae -- float, mean average error.
 
     Raises:
     ValueError -- if the arrays are not broadcastable
@@ -74,7 +93,13 @@ def compute_mae(y_true, y_pred):
         check_broadcasting(y_true, y_pred)
     except ValueError as e:
         raise e
-    return np.mean(np.abs(y_true - y_pred))
+    diff = np.asarray(y_true - y_pred)
+
+    if diff.ndim == 0:
+        # Scalars cannot be written in place
+        return float(np.abs(diff))
+
+    return float(np.mean(np.abs(diff, out=diff)))
 
 
 def compute_mse(y_true, y_pred):
@@ -85,6 +110,7 @@ def compute_mse(y_true, y_pred):
     y_pred -- np.array, predicted values.
 
     Return:
+    mse -- float, mean squared error.
 
     Raises:
     ValueError -- if the arrays are not broadcastable
@@ -95,7 +121,7 @@ def compute_mse(y_true, y_pred):
         check_broadcasting(y_true, y_pred)
     except ValueError as e:
         raise e
-    return np.mean((y_true - y_pred) ** 2)
+    return float(_mean_square(y_true - y_pred))
 
 
 def compute_van_rossum_distance(y_true, y_pred, time, tau=1.0):
@@ -116,7 +142,7 @@ def compute_van_rossum_distance(y_true, y_pred, time, tau=1.0):
     if y_true.ndim != 1 or y_pred.ndim != 1:
         raise ValueError("array should be 1D")
 
-    if len(time) == 0:
+    if time is None or len(time) == 0:
         raise ValueError("time array should be 1D")
 
     try:
@@ -124,21 +150,227 @@ def compute_van_rossum_distance(y_true, y_pred, time, tau=1.0):
     except ValueError as e:
         raise e
 
-    st_true = symprobe.utils.create_spike_train(
-        symprobe.utils.extract_spike_times(y_true, time),
-        time[-1],
+    return float(
+        _spike_train_distance(
+            _spike_times(y_true, time),
+            _spike_times(y_pred, time),
+            tau,
+        )
+    )
+
+
+def _spike_times(y, time):
+    """Extracts the spike times of a trace
+
+    Arguments:
+    y -- np.array, trace values.
+    time -- np.array, corresponding time points.
+
+    Return:
+    spike_times -- np.array, sorted spike times of the trace.
+
+    """
+    return np.sort(symprobe.utils.extract_spike_times(y, time))
+
+
+def _markage(values):
+    """Computes the markage of a spike train
+
+    The markage of a spike is the sum of the exponential kernels of the
+    previous spikes evaluated at that spike.
+
+    Arguments:
+    values -- np.array, sorted spike times divided by the time constant.
+
+    Return:
+    markage -- np.array, markage of each spike.
+
+    """
+    markage = np.zeros(len(values))
+    exp_diffs = np.exp(values[:-1] - values[1:])
+
+    for i in range(len(values) - 1):
+        markage[i + 1] = (markage[i] + 1.0) * exp_diffs[i]
+
+    return markage
+
+
+def _train_terms(spike_times, tau):
+    """Computes the terms of a spike train used by the Van Rossum distance
+
+    Arguments:
+    spike_times -- np.array, sorted spike times.
+    tau -- float, time constant for the exponential kernel.
+
+    Return:
+    values -- np.array, spike times divided by the time constant.
+    markage -- np.array, markage of each spike.
+    self_term -- float, squared norm of the filtered spike train.
+
+    """
+    values = spike_times / tau
+    markage = _markage(values)
+    return values, markage, len(values) + 2.0 * np.sum(markage)
+
+
+def _terms_distance(terms_true, terms_pred):
+    """Computes the Van Rossum distance from the terms of two spike trains
+
+    Arguments:
+    terms_true -- tuple, terms of the ground truth spike train.
+    terms_pred -- tuple, terms of the estimated spike train.
+
+    Return:
+    distance -- float, Van Rossum distance.
+
+    """
+    u, m_u, d_uu = terms_true
+    v, m_v, d_vv = terms_pred
+
+    # Cross spike train terms, last spike of one train before each spike
+    js = np.searchsorted(v, u, "right") - 1
+    ks = np.searchsorted(u, v, "left") - 1
+    j_mask = js >= 0
+    k_mask = ks >= 0
+    js = js[j_mask]
+    ks = ks[k_mask]
+
+    d_uv = np.sum(np.exp(v[js] - u[j_mask]) * (1.0 + m_v[js]))
+    d_uv += np.sum(np.exp(u[ks] - v[k_mask]) * (1.0 + m_u[ks]))
+
+    # Clip small negative values due to floating point errors
+    return np.sqrt(max(d_uu + d_vv - d_uv - d_uv, 0.0))
+
+
+def _spike_train_distance(st_true, st_pred, tau):
+    """Computes the Van Rossum distance between two spike trains
+
+    The distance is computed in closed form from the markage of the spike
+    trains (Houghton and Kreuz, 2012), with the same terms as elephant's
+    van_rossum_distance but without the overhead of units.
+
+    Arguments:
+    st_true -- np.array, sorted ground truth spike times.
+    st_pred -- np.array, sorted estimated spike times.
+    tau -- float, time constant for the exponential kernel.
+
+    Return:
+    distance -- float, Van Rossum distance.
+
+    """
+    n_true, n_pred = len(st_true), len(st_pred)
+
+    if tau == 0:
+        return np.sqrt(np.float64(n_true + n_pred))
+
+    if tau == np.inf:
+        return np.float64(abs(n_true - n_pred))
+
+    return _terms_distance(
+        _train_terms(st_true, tau),
+        _train_terms(st_pred, tau),
+    )
+
+
+def compute_vrd_batch(y_true, y_pred, time, tau=1.0):
+    """Computes the Van Rossum distance between each row of y_true and y_pred
+
+    The spike trains are extracted once per row, a single row compared
+    against all the rows of the other array is only extracted once.
+
+    Arguments:
+    y_true -- np.array, ground truth values, one row per trace.
+    y_pred -- np.array, estimated values, one row per trace.
+    time -- np.array, corresponding time points.
+    tau -- float, time constant for the exponential kernel, default: 1.
+
+    Return:
+    distances -- np.array, Van Rossum distance of each row.
+
+    Raises:
+    ValueError -- if the rows are not 1D.
+    ValueError -- if the time array is missing.
+    ValueError -- if the arrays are not broadcastable
+
+    """
+    y_true = np.atleast_2d(y_true)
+    y_pred = np.atleast_2d(y_pred)
+
+    if y_true.ndim != 2 or y_pred.ndim != 2:
+        raise ValueError("array should be 1D")
+
+    if time is None or len(time) == 0:
+        raise ValueError("time array should be 1D")
+
+    try:
+        nb_rows = np.broadcast_shapes(y_true.shape, y_pred.shape)[0]
+    except ValueError as e:
+        raise e
+
+    st_true = [_spike_times(y, time) for y in y_true]
+    st_pred = [_spike_times(y, time) for y in y_pred]
+
+    return np.array(
+        [
+            _spike_train_distance(
+                st_true[i % len(st_true)],
+                st_pred[i % len(st_pred)],
+                tau,
+            )
+            for i in range(nb_rows)
+        ]
     )
-    st_pred = symprobe.utils.create_spike_train(
-        symprobe.utils.extract_spike_times(y_pred, time),
-        time[-1],
+
+
+def compute_vrd_matrix(y_true, y_pred, time, tau=1.0):
+    """Computes the Van Rossum distance between every row of two arrays
+
+    The spike trains and their markage are computed once per row and
+    shared by all the pairs.
+
+    Arguments:
+    y_true -- np.array, ground truth values, one row per trace.
+    y_pred -- np.array, estimated values, one row per trace.
+    time -- np.array, corresponding time points.
+    tau -- float, time constant for the exponential kernel, default: 1.
+
+    Return:
+    distances -- np.array, Van Rossum distance between row i of y_true and
+    row j of y_pred at index [i, j].
+
+    Raises:
+    ValueError -- if the rows are not 1D.
+    ValueError -- if the time array is missing.
+
+    """
+    y_true = np.atleast_2d(y_true)
+    y_pred = np.atleast_2d(y_pred)
+
+    if y_true.ndim != 2 or y_pred.ndim != 2:
+        raise ValueError("array should be 1D")
+
+    if time is None or len(time) == 0:
+        raise ValueError("time array should be 1D")
+
+    st_true = [_spike_times(y, time) for y in y_true]
+    st_pred = [_spike_times(y, time) for y in y_pred]
+
+    if tau == 0 or tau == np.inf:
+        # Only depends on the number of spikes
+        return np.array(
+            [[_spike_train_distance(a, b, tau) for b in st_pred]
+             for a in st_true]
+        )
+
+    terms_true = [_train_terms(st, tau) for st in st_true]
+    terms_pred = [_train_terms(st, tau) for st in st_pred]
+
+    return np.array(
+        [[_terms_distance(a, b) for b in terms_pred] for a in terms_true]
     )
-    return van_rossum_distance(
-        [st_true, st_pred],
-        tau * symprobe.utils.quant.s,
-    )[0, 1]
 
 
-def compute_comparison(y_true, y_pred, metric, tau=1.0, time=np.array([])):
+def compute_comparison(y_true, y_pred, metric, tau=1.0, time=None):
     """Computes the comparison between y_true and y_pred based on the metric
 
     Arguments:
@@ -147,7 +379,8 @@ def compute_comparison(y_true, y_pred, metric, tau=1.0, time=np.array([])):
     metric -- str, comparison metric {rmse, mae, mse}.
     tau -- float, time constant for the exponential kernel in the
     Van Rossum distance, default: 1.
-    time -- np.array, corresponding time points, default: [].
+    time -- np.array, corresponding time points, only used by the Van
+    Rossum distance, default: None.
 
 
     Return:
@@ -180,3 +413,166 @@ def compute_comparison(y_true, y_pred, metric, tau=1.0, time=np.array([])):
                 raise ValueError("invalid metric {}\n".format(metric))
     except ValueError as e:
         raise e
+
+
+def _row_mean_squared_error(y_true, y_pred):
+    """Computes the mean squared error of each row of two 2D arrays
+
+    The squared differences are reduced with einsum to avoid allocating
+    a second temporary array. The sums are accumulated in double precision
+    so that long single precision traces do not lose accuracy.
+
+    Arguments:
+    y_true -- np.array, ground truth values, one row per trace.
+    y_pred -- np.array, estimated values, one row per trace.
+
+    Return:
+    mse -- np.array, mean squared error of each row.
+
+    """
+    diff = y_true - y_pred
+    return (
+        np.einsum("ij,ij->i", diff, diff, dtype=np.float64) / diff.shape[1]
+    )
+
+
+def compute_comparison_batch(
+    y_true,
+    y_pred,
+    metric,
+    tau=1.0,
+    time=None,
+):
+    """Computes the comparison between each row of y_true and y_pred
+
+    Arguments:
+    y_true -- np.array, ground truth values, one row per trace.
+    y_pred -- np.array, estimated values, one row per trace.
+    metric -- str, comparison metric {rmse, mae, mse, vrd}.
+    tau -- float, time constant for the exponential kernel in the
+    Van Rossum distance, default: 1.
+    time -- np.array, corresponding time points, only used by the Van
+    Rossum distance, default: None.
+
+    Return:
+    comp_points -- np.array, comparison point of each row.
+
+    Raises:
+    ValueError -- if the provided metric is not one of
+    {'rmse', 'mae', 'mse', 'vrd'}.
+    ValueError -- if the arrays are not broadcastable
+
+    """
+    if metric == "vrd":
+        try:
+            return compute_vrd_batch(y_true, y_pred, time=time, tau=tau)
+        except ValueError as e:
+            raise e
+
+    try:
+        y_true, y_pred = np.broadcast_arrays(
+            np.atleast_2d(y_true),
+            np.atleast_2d(y_pred),
+        )
+    except ValueError as e:
+        raise e
+
+    match metric:
+        case "rmse":
+            return np.sqrt(_row_mean_squared_error(y_true, y_pred))
+
+        case "mae":
+            diff = y_true - y_pred
+            return np.mean(np.abs(diff, out=diff), axis=1)
+
+        case "mse":
+            return _row_mean_squared_error(y_true, y_pred)
+        case _:
+            raise ValueError("invalid metric {}\n".format(metric))
+
+
+def _pairwise_mean_squared_error(y_true, y_pred):
+    """Computes the mean squared error between every pair of rows
+
+    The squared distances are expanded as |a|^2 + |b|^2 - 2 a.b so that
+    all the pairs are computed with a single matrix product.
+
+    Arguments:
+    y_true -- np.array, ground truth values, one row per trace.
+    y_pred -- np.array, estimated values, one row per trace.
+
+    Return:
+    mse -- np.array, mean squared error of each pair of rows.
+
+    """
+    sq_true = np.einsum("ij,ij->i", y_true, y_true)
+    sq_pred = np.einsum("ij,ij->i", y_pred, y_pred)
+
+    mse = y_true @ y_pred.T
+    mse *= -2.0
+    mse += sq_true[:, None]
+    mse += sq_pred[None, :]
+
+    # Clip small negative values due to floating point errors
+    np.maximum(mse, 0.0, out=mse)
+    return mse / y_true.shape[1]
+
+
+def compute_comparison_matrix(y_true, y_pred, metric, tau=1.0, time=None):
+    """Computes the comparison between every row of y_true and y_pred
+
+    The values are computed in double precision and the mean trace of
+    y_true is removed from both arrays, which leaves the differences
+    unchanged but reduces the rounding errors of the squared errors.
+
+    Arguments:
+    y_true -- np.array, ground truth values, one row per trace.
+    y_pred -- np.array, estimated values, one row per trace.
+    metric -- str, comparison metric {rmse, mae, mse, vrd}.
+    tau -- float, time constant for the exponential kernel in the
+    Van Rossum distance, default: 1.
+    time -- np.array, corresponding time points, only used by the Van
+    Rossum distance, default: None.
+
+    Return:
+    comp_matrix -- np.array, comparison point between row i of y_true and
+    row j of y_pred at index [i, j].
+
+    Raises:
+    ValueError -- if the provided metric is not one of
+    {'rmse', 'mae', 'mse', 'vrd'}.
+    ValueError -- if the rows do not have the same length.
+
+    """
+    if metric == "vrd":
+        try:
+            return compute_vrd_matrix(y_true, y_pred, time=time, tau=tau)
+        except ValueError as e:
+            raise e
+
+    y_true = np.atleast_2d(y_true).astype(np.float64, copy=False)
+    y_pred = np.atleast_2d(y_pred).astype(np.float64, copy=False)
+
+    if y_true.ndim != 2 or y_pred.ndim != 2:
+        raise ValueError("array should be 2D")
+
+    if y_true.shape[1] != y_pred.shape[1]:
+        raise ValueError("rows should have the same length")
+
+    offset = np.mean(y_true, axis=0)
+    y_true = y_true - offset
+    y_pred = y_pred - offset
+
+    match metric:
+        case "rmse":
+            return np.sqrt(_pairwise_mean_squared_error(y_true, y_pred))
+
+        case "mae":
+            return np.array(
+                [np.mean(np.abs(y_pred - row), axis=1) for row in y_true]
+            )
+
+        case "mse":
+            return _pairwise_mean_squared_error(y_true, y_pred)
+        case _:
+            raise ValueError("invalid metric {}\n".format(metric))
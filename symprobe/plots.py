@@ -8,18 +8,45 @@ Author: Mathias Roesler
 Date: 11/24
 """
 
+import matplotlib
 import matplotlib.pyplot as plt
 
-from .constants import LEFT, RIGHT, BOTTOM, COLOURS, PARAM, UNITS
+from .constants import LEFT, RIGHT, BOTTOM, SAVE_DPI, COLOURS, PARAM, UNITS
 
+# Backends without a window, figures are saved instead of shown
+NON_INTERACTIVE_BACKENDS = {"agg", "cairo", "pdf", "pgf", "ps", "svg"}
 
-def plot_cell_data(V, t, estrus="estrus"):
+
+def _show(fig, name):
+    """Shows a figure or saves it on non-interactive backends
+
+    On non-interactive backends the figure is saved as a png file in the
+    current directory and closed to free its memory. Figures are drawn at
+    the default resolution and only rendered at SAVE_DPI when saved.
+
+    Arguments:
+    fig -- matplotlib.figure.Figure, figure to show.
+    name -- str, name of the png file without extension.
+
+    Return:
+
+    """
+    if matplotlib.get_backend().lower() in NON_INTERACTIVE_BACKENDS:
+        fig.savefig(f"{name}.png", dpi=SAVE_DPI)
+        plt.close(fig)
+    else:
+        plt.show()
+
+
+def plot_cell_data(V, t, estrus="estrus", name=None):
     """Plots the membrane potential of cells
 
     Arguments:
     V -- ndarray, array with data from N cells to be plotted.
     t -- ndarray, time vector.
     estrus -- str, estrus phase, default value "estrus".
+    name -- str, name of the file if the figure is saved, default value
+    cell_data_<estrus>.
 
     Return:
 
@@ -32,24 +59,33 @@ def plot_cell_data(V, t, estrus="estrus"):
     if not V.shape[0] == t.shape[0]:
         raise ValueError("dimensions must agree.")
 
-    for j in range(V.shape[1]):
-        fig, ax = plt.subplots(dpi=300)
-        plt.plot(t, V[:, j], COLOURS[estrus], linestyle="-")
+    nb_cells = V.shape[1]
+    height = 2.4 * nb_cells  # Half the default figure height per cell
 
-        plt.xlabel("Time (s)", fontsize=15)
-        plt.ylabel("Amplitude (mV)", fontsize=15)
+    # One row per cell in a single figure
+    fig, axes = plt.subplots(
+        nb_cells,
+        1,
+        sharex=True,
+        squeeze=False,
+        figsize=(6.4, height),
+    )
 
-        plt.xticks(fontsize=12)
-        plt.yticks(fontsize=12)
+    for j, ax in enumerate(axes[:, 0]):
+        ax.plot(t, V[:, j], COLOURS[estrus], linestyle="-")
+        ax.tick_params(labelsize=12)
+        ax.set_ylim([-70, 15])
 
-        plt.xlim([0, max(t)])
-        plt.ylim([-70, 15])
+    ax.set_xlabel("Time (s)", fontsize=15)
+    ax.set_xlim([0, max(t)])
+    fig.supylabel("Amplitude (mV)", fontsize=15)
 
-        plt.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
-        plt.show()
+    # Keep the same bottom margin in inches as the single plots
+    fig.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM * 4.8 / height)
+    _show(fig, name or f"cell_data_{estrus}")
 
 
-def plot_cell_comparison(V1, V2, t, estrus="estrus"):
+def plot_cell_comparison(V1, V2, t, estrus="estrus", name=None):
     """Plots the membrane potential of cells from two simulations
 
     Arguments:
@@ -57,6 +93,8 @@ def plot_cell_comparison(V1, V2, t, estrus="estrus"):
     V2 -- ndarray, array to compare with N cells to be plotted.
     t -- ndarray, time vector.
     estrus -- str, estrus phase, default value "estrus".
+    name -- str, name of the file if the figure is saved, default value
+    cell_comparison_<estrus>.
 
     Return:
 
@@ -69,26 +107,26 @@ def plot_cell_comparison(V1, V2, t, estrus="estrus"):
     if not V1.shape[0] == t.shape[0] or not V1.shape[0] == V2.shape[0]:
         raise ValueError("dimensions must agree.")
 
-    fig, ax = plt.subplots(dpi=300)
-    plt.plot(t, V1, COLOURS[estrus], linestyle="-")
-    plt.plot(t, V2, "grey", linestyle="--")
+    fig, ax = plt.subplots()
+    ax.plot(t, V1, COLOURS[estrus], linestyle="-")
+    ax.plot(t, V2, "grey", linestyle="--")
 
-    plt.xlabel("Time (s)", fontsize=15)
-    plt.ylabel("Amplitude (mV)", fontsize=15)
+    ax.set_xlabel("Time (s)", fontsize=15)
+    ax.set_ylabel("Amplitude (mV)", fontsize=15)
 
-    plt.xticks(fontsize=12)
-    plt.yticks(fontsize=12)
+    # Only resize the labels, tick spacing is kept for the default size
+    plt.setp(ax.get_xticklabels() + ax.get_yticklabels(), fontsize=12)
 
-    plt.xlim([min(t), max(t)])
-    plt.ylim([-70, 15])
+    ax.set_xlim([min(t), max(t)])
+    ax.set_ylim([-70, 15])
 
-    plt.legend(["Idealised", "Realistic"])
-    plt.title(f"{estrus.capitalize()}")
-    plt.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
-    plt.show()
+    ax.legend(["Idealised", "Realistic"])
+    ax.set_title(f"{estrus.capitalize()}")
+    fig.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
+    _show(fig, name or f"cell_comparison_{estrus}")
 
 
-def plot_resolution_convergence(comp_dict, density_data, metric):
+def plot_resolution_convergence(comp_dict, density_data, metric, name=None):
     """Plots the convergence for different resolution meshes
 
     Arguments:
@@ -96,6 +134,8 @@ def plot_resolution_convergence(comp_dict, density_data, metric):
     comparison data.
     density_data -- np.array, number of elements in each mesh.
     metric -- str, metric used for the comparison.
+    name -- str, name of the file if the figure is saved, default value
+    resolution_<metric>.
 
     Return:
 
@@ -103,23 +143,35 @@ def plot_resolution_convergence(comp_dict, density_data, metric):
 
     """
     # Create figure and plot
-    fig, ax = plt.subplots(dpi=300)
+    fig, ax = plt.subplots()
 
     for stage, comp_data in comp_dict.items():
-        plt.plot(density_data, comp_data, COLOURS[stage] + ".-")
+        ax.plot(
+            density_data,
+            comp_data,
+            color=COLOURS[stage],
+            marker=".",
+            linestyle="-",
+        )
 
-    plt.legend([estrus.capitalize() for estrus in comp_dict.keys()])
+    ax.legend([estrus.capitalize() for estrus in comp_dict.keys()])
 
-    plt.xlabel("Number of elements")
-    plt.ylabel("{} (mV)".format(metric.upper()))
+    ax.set_xlabel("Number of elements")
+    ax.set_ylabel("{} (mV)".format(metric.upper()))
 
     ax.ticklabel_format(axis="x", style="sci", scilimits=(0, 0))
 
-    plt.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
-    plt.show()
+    fig.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
+    _show(fig, name or f"resolution_{metric}")
 
 
-def plot_parameter_comparison(comp_dict, parameter_values, metric, parameter):
+def plot_parameter_comparison(
+    comp_dict,
+    parameter_values,
+    metric,
+    parameter,
+    name=None,
+):
     """Plots the convergence for different resolution meshes
 
     Arguments:
@@ -128,6 +180,8 @@ def plot_parameter_comparison(comp_dict, parameter_values, metric, parameter):
     parameter_values, np.array, values of the parameter.
     metric -- str, metric used for the comparison.
     parameter -- str, name of the parameter.
+    name -- str, name of the file if the figure is saved, default value
+    <parameter>_<metric>.
 
     Return:
 
@@ -135,22 +189,28 @@ def plot_parameter_comparison(comp_dict, parameter_values, metric, parameter):
 
     """
     # Create figure and plot
-    fig, ax = plt.subplots(dpi=300)
+    fig, ax = plt.subplots()
 
     for stage, comp_data in comp_dict.items():
-        plt.plot(parameter_values, comp_data, COLOURS[stage] + ".-")
+        ax.plot(
+            parameter_values,
+            comp_data,
+            color=COLOURS[stage],
+            marker=".",
+            linestyle="-",
+        )
 
     if len(comp_dict.keys()) != 1:
-        plt.legend([estrus.capitalize() for estrus in comp_dict.keys()])
+        ax.legend([estrus.capitalize() for estrus in comp_dict.keys()])
 
-    plt.xlabel(PARAM[parameter] + " " + UNITS[parameter])
-    plt.ylabel("{}".format(metric.upper()))
+    ax.set_xlabel(PARAM[parameter] + " " + UNITS[parameter])
+    ax.set_ylabel("{}".format(metric.upper()))
 
-    plt.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
-    plt.show()
+    fig.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
+    _show(fig, name or f"{parameter}_{metric}")
 
 
-def plot_spike_propagation(spike_dict, parameter_values, parameter):
+def plot_spike_propagation(spike_dict, parameter_values, parameter, name=None):
     """Plots the number of spikes propagated to the cervix
 
     Arguments:
@@ -158,6 +218,8 @@ def plot_spike_propagation(spike_dict, parameter_values, parameter):
     spike propagation data.
     parameter_values, np.array, values of the parameter.
     parameter -- str, name of the parameter.
+    name -- str, name of the file if the figure is saved, default value
+    <parameter>_spikes.
 
     Return:
 
@@ -165,16 +227,22 @@ def plot_spike_propagation(spike_dict, parameter_values, parameter):
 
     """
     # Create figure and plot
-    fig, ax = plt.subplots(dpi=300)
+    fig, ax = plt.subplots()
 
     for stage, spike_data in spike_dict.items():
-        plt.plot(parameter_values, spike_data, COLOURS[stage] + ".-")
+        ax.plot(
+            parameter_values,
+            spike_data,
+            color=COLOURS[stage],
+            marker=".",
+            linestyle="-",
+        )
 
     if len(spike_dict.keys()) != 1:
-        plt.legend([estrus.capitalize() for estrus in spike_dict.keys()])
+        ax.legend([estrus.capitalize() for estrus in spike_dict.keys()])
 
-    plt.xlabel(PARAM[parameter] + " " + UNITS[parameter])
-    plt.ylabel("Number of propagated spikes")
+    ax.set_xlabel(PARAM[parameter] + " " + UNITS[parameter])
+    ax.set_ylabel("Number of propagated spikes")
 
-    plt.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
-    plt.show()
+    fig.subplots_adjust(left=LEFT, right=RIGHT, bottom=BOTTOM)
+    _show(fig, name or f"{parameter}_spikes")
@@ -10,14 +10,36 @@ Date: 11/24
 """
 
 import os
+import re
+import shutil
 import subprocess
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 from symprobe.constants import CONFIG_ENV_VAR, ESTRUS
 
+# Line written in the configuration files for each parameter
+CONFIG_FORMATS = {
+    "conductivities_2d": "{param} = [{value}, {value}] ",
+    "conductivities_3d": "{param} = [{value}, {value}, {value}] ",
+    "magnitude": "{param} = {value} ",
+    "mesh_name": '{param} = "{value}"',
+    "estrus": '{param} = "{value}"',
+}
+DEFAULT_CONFIG_FORMAT = "   {param} = {value} "  # Cell parameters section
+
+# String values read from the dimension configuration files
+CELL_TYPE_RE = re.compile(r'^[ \t]*cell_type[ \t]*=[ \t]*"([^"]*)"', re.M)
+ESTRUS_RE = re.compile(r'^[ \t]*estrus[ \t]*=[ \t]*"([^"]*)"', re.M)
+
 
 def modify_config(config_file, param, value):
     """Modifies the parameter in the configuration file
 
+    Only the first line assigning the parameter is modified.
+
     Arguments:
     config_file -- str, path to the configuration file.
     param -- str, parameter to modify.
@@ -29,45 +51,62 @@ def modify_config(config_file, param, value):
     FileNotFoundError -- if the cell configuration file is not found.
     ValueError -- if the parameter is not found.
 
+    """
+    try:
+        modify_config_many(config_file, {param: value})
+    except ValueError as e:
+        raise e
+    except FileNotFoundError as e:
+        raise e
+
+
+def modify_config_many(config_file, updates):
+    """Modifies several parameters in the configuration file at once
+
+    The file is read and written a single time and is left unchanged if
+    one of the parameters is not found. Only the first line assigning each
+    parameter is modified.
+
+    Arguments:
+    config_file -- str, path to the configuration file.
+    updates -- dict, new value of each parameter to modify.
+
+    Return:
+
+    Raises:
+    FileNotFoundError -- if the cell configuration file is not found.
+    ValueError -- if one of the parameters is not found.
+
     """
     # Read and modify config file
     try:
         with open(config_file, "r") as f:
-            lines = f.readlines()
+            content = f.read()
     except FileNotFoundError as e:
         raise e
 
-    found = False  # To check param is found
-
-    for i, line in enumerate(lines):
-        if param in line:
-            found = True
-            if param == "conductivities_2d":
-                lines[i] = f"{param} = [{value}, {value}] \n"
-                break
-            if param == "conductivities_3d":
-                lines[i] = f"{param} = [{value}, {value}, {value}] \n"
-                break
-            if param == "magnitude":
-                lines[i] = f"{param} = {value} \n"
-                break
-            if param == "mesh_name":
-                lines[i] = f'mesh_name = "{value}"\n'
-                break
-            if param == "estrus":
-                lines[i] = f'estrus = "{value}"\n'
-                break
-            else:
-                lines[i] = f"   {param} = {value} \n"
-                break
-    if not found:
-        # If the parameter was not found
-        raise ValueError(
-            f"the parameter '{param}' was not found in the configuration file."
+    for param, value in updates.items():
+        line = CONFIG_FORMATS.get(param, DEFAULT_CONFIG_FORMAT).format(
+            param=param,
+            value=value,
         )
+        content, found = re.subn(
+            rf"^[^\S\n]*{re.escape(param)}[^\S\n]*=.*$",
+            lambda _: line,
+            content,
+            count=1,
+            flags=re.M,
+        )
+
+        if not found:
+            # If the parameter was not found
+            raise ValueError(
+                f"the parameter '{param}' was not found in the configuration"
+                " file."
+            )
 
     with open(config_file, "w") as f:
-        f.writelines(lines)
+        f.write(content)
 
 
 def get_config_dir():
@@ -130,37 +169,134 @@ def get_cell_config(dim_config_file):
     except OSError as e:
         raise e
 
-    type_found = False
-    estrus_found = False
-
     try:
         with open(dim_config_file, "r") as f:
-            for line in f:
-                if "cell_type" in line:
-                    cell_type = line.split('"')[1]
-                    type_found = True
-
-                if "estrus" in line:
-                    # Get estrus if the cell type is Roesler
-                    estrus = line.split('"')[1]
-                    estrus_found = True
+            content = f.read()
     except FileNotFoundError as e:
         raise e
 
-    if not type_found:
+    cell_type = CELL_TYPE_RE.search(content)
+
+    if cell_type is None:
         raise ValueError("cell_type not found in config file")
 
-    if not estrus_found and cell_type == "Roesler":
+    cell_type = cell_type.group(1)
+
+    # Get estrus if the cell type is Roesler
+    estrus = ESTRUS_RE.search(content)
+
+    if estrus is None and cell_type == "Roesler":
         raise ValueError("estrus not found in config file")
 
     if cell_type == "Roesler":
-        return os.path.join(config_dir, "estrus", f"{cell_type}_{estrus}.toml")
+        return os.path.join(
+            config_dir, "estrus", f"{cell_type}_{estrus.group(1)}.toml"
+        )
 
     else:
         return os.path.join(config_dir, "cell", f"{cell_type}.toml")
 
 
-def resolution_sweep(dim, mesh_name, start_val, end_val):
+def _run_copy(dim, config_dir, config_file, param, value):
+    """Runs a simulation on a private copy of the configuration directory
+
+    Arguments:
+    dim -- int, dimension of the simulation {2, 3}.
+    config_dir -- str, path to the configuration directory.
+    config_file -- str, path to the configuration file in config_dir.
+    param -- str, parameter to modify.
+    value -- str, new value.
+
+    Return:
+
+    Raises:
+    FileNotFoundError -- if the configuration file is not found.
+    ValueError -- if the parameter is not found.
+    subprocess.CalledProcessError -- if the simulation fails.
+
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run_dir = shutil.copytree(config_dir, os.path.join(tmp_dir, "config"))
+        run_config_file = os.path.join(
+            run_dir, os.path.relpath(config_file, config_dir)
+        )
+
+        try:
+            modify_config(run_config_file, param, value)
+        except ValueError as e:
+            raise e
+        except FileNotFoundError as e:
+            raise e
+
+        # Run the chaste simulation with the copied configuration
+        subprocess.run(
+            ["uterine-simulation", str(dim)],
+            env={**os.environ, CONFIG_ENV_VAR: run_dir},
+            check=True,
+        )
+
+
+def _run_sweep(dim, config_file, param, values, max_workers=1):
+    """Runs one simulation for each value of the parameter
+
+    With a single worker the configuration file is modified in place
+    before each simulation. With more workers each simulation is run on
+    its own copy of the configuration directory so that runs can overlap.
+
+    Arguments:
+    dim -- int, dimension of the simulation {2, 3}.
+    config_file -- str, path to the configuration file.
+    param -- str, parameter to modify.
+    values -- list, values of the parameter, one per simulation.
+    max_workers -- int, number of simulations to run at once, default 1.
+
+    Return:
+
+    Raises:
+    OSError -- if the CONFIG_ENV_VAR is not set.
+    ValueError -- if max_workers is smaller than 1.
+    FileNotFoundError -- if the configuration file is not found.
+    ValueError -- if the parameter is not found.
+    subprocess.CalledProcessError -- if a simulation fails.
+
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers should be at least 1")
+
+    if max_workers == 1:
+        for value in values:
+            # Read and modify config file
+            try:
+                modify_config(config_file, param, value)
+            except ValueError as e:
+                raise e
+            except FileNotFoundError as e:
+                raise e
+
+            # Run the chaste simulation
+            subprocess.run(["uterine-simulation", str(dim)], check=True)
+        return
+
+    try:
+        config_dir = get_config_dir()
+
+    except OSError as e:
+        raise e
+
+    run_fct = partial(_run_copy, dim, config_dir, config_file, param)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            # Consume the results to re-raise the errors of the runs
+            for _ in executor.map(run_fct, values):
+                pass
+        except Exception as e:
+            # Do not start the runs that are still waiting
+            executor.shutdown(cancel_futures=True)
+            raise e
+
+
+def resolution_sweep(dim, mesh_name, start_val, end_val, max_workers=1):
     """Performs several simulations with different resolution meshes
 
     The meshes should be named like mesh_name_X.{ele, node, face}, where
@@ -171,6 +307,7 @@ def resolution_sweep(dim, mesh_name, start_val, end_val):
     mesh_name -- str, base name of the mesh.
     start_val -- float, start value for X.
     end_val -- float, end value for X.
+    max_workers -- int, number of simulations to run at once, default 1.
 
     Return:
 
@@ -179,6 +316,7 @@ def resolution_sweep(dim, mesh_name, start_val, end_val):
     ValueError -- if the start value is greater than the end value.
     FileNotFoundError -- if the cell configuration file is not found.
     ValueError -- if the parameter is not found in the configuration file.
+    subprocess.CalledProcessError -- if a simulation fails.
 
     """
     # Get the config files
@@ -192,21 +330,15 @@ def resolution_sweep(dim, mesh_name, start_val, end_val):
     if start_val > end_val:
         raise ValueError("the start value is greater than the end value")
 
-    for j in range(start_val, end_val + 1):
-        # Read and modify config file
-        cur_mesh = f"{mesh_name}_{j}"
-        try:
-            modify_config(dim_config_file, "mesh_name", cur_mesh)
-        except ValueError as e:
-            raise e
-        except FileNotFoundError as e:
-            raise e
+    meshes = [f"{mesh_name}_{j}" for j in range(start_val, end_val + 1)]
 
-        # Run the chaste simulation
-        subprocess.run(["uterine-simulation", str(dim)])
+    try:
+        _run_sweep(dim, dim_config_file, "mesh_name", meshes, max_workers)
+    except Exception as e:
+        raise e
 
 
-def parameter_sweep(dim, param, start_val, end_val, step):
+def parameter_sweep(dim, param, start_val, end_val, step, max_workers=1):
     """Performs several simulations with different values of a parameter
 
     Arguments:
@@ -215,6 +347,7 @@ def parameter_sweep(dim, param, start_val, end_val, step):
     start_val -- float, start value for the parameter.
     end_val -- float, end value for the parameter.
     step -- float, increase step between two simulations.
+    max_workers -- int, number of simulations to run at once, default 1.
 
     Return:
 
@@ -225,6 +358,7 @@ def parameter_sweep(dim, param, start_val, end_val, step):
     ValueError -- if the start value is greater than the end value.
     FileNotFoundError -- if the cell configuration file is not found.
     ValueError -- if the parameter is not found in the configuration file.
+    subprocess.CalledProcessError -- if a simulation fails.
 
     """
     # Initial setup
@@ -244,17 +378,10 @@ def parameter_sweep(dim, param, start_val, end_val, step):
     if value > end:
         raise ValueError("the start value is greater than the end value")
 
-    while True:
-        # Read and modify config file
-        try:
-            modify_config(cell_config_file, param, value)
-        except ValueError as e:
-            raise e
-        except FileNotFoundError as e:
-            raise e
+    values = []
 
-        # Run the chaste simulation
-        subprocess.run(["uterine-simulation", str(dim)])
+    while True:
+        values.append(value)
 
         # Update value for next iteration
         value += step
@@ -263,12 +390,18 @@ def parameter_sweep(dim, param, start_val, end_val, step):
         if value > end:
             break
 
+    try:
+        _run_sweep(dim, cell_config_file, param, values, max_workers)
+    except Exception as e:
+        raise e
+
 
-def estrus_sweep(dim):
+def estrus_sweep(dim, max_workers=1):
     """Performs simulations over all four stages of the estrus cycle
 
     Arguments:
     dim -- int, dimension of the simulation {2, 3}.
+    max_workers -- int, number of simulations to run at once, default 1.
 
     Return:
 
@@ -277,6 +410,7 @@ def estrus_sweep(dim):
     ValueError -- if the start value is greater than the end value.
     FileNotFoundError -- if the cell configuration file is not found.
     ValueError -- if the parameter is not found in the configuration file.
+    subprocess.CalledProcessError -- if a simulation fails.
 
     """
     # Get the config files
@@ -286,16 +420,7 @@ def estrus_sweep(dim):
     except Exception as e:
         raise e
 
-    dim_config_file = get_dim_config(dim)
-
-    for j in range(4):
-        # Read and modify config file
-        try:
-            modify_config(dim_config_file, "estrus", ESTRUS[j])
-        except ValueError as e:
-            raise e
-        except FileNotFoundError as e:
-            raise e
-
-        # Run the chaste simulation
-        subprocess.run(["uterine-simulation", str(dim)])
+    try:
+        _run_sweep(dim, dim_config_file, "estrus", ESTRUS, max_workers)
+    except Exception as e:
+        raise e
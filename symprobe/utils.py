@@ -8,15 +8,83 @@ Author: Mathias Roesler
 Date: 11/24
 """
 
+import os
 import re
 
+from contextlib import contextmanager
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
-import quantities as quant
 
 from symprobe.constants import HORN_LENGTH_DICT
-from scipy.signal import find_peaks
-from neo.core import SpikeTrain
+
+
+# Patterns matching a single line of the log files
+PRINT_TIMESTEP_RE = re.compile(r"print timestep:[^\S\n]*(\d+\.*\d*)[^\S\n]*ms")
+MESH_RE = re.compile(r"^.*mesh.*$", re.M)
+
+# Simulation numbers given as a single number or a range like 1-3
+RANGE_RE = re.compile(r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?")
+
+
+def _read_file(log_path):
+    """Reads the content of a log file
+
+    Arguments:
+    log_path -- str, path to the log file.
+
+    Return:
+    content -- str, content of the log file.
+
+    """
+    with open(log_path, "r") as log_file:
+        return log_file.read()
+
+
+@lru_cache(maxsize=256)
+def _read_cached_file(log_path, mtime_ns):
+    """Reads the content of a log file once per modification time
+
+    Arguments:
+    log_path -- str, path to the log file.
+    mtime_ns -- int, modification time of the file, only used as cache key.
+
+    Return:
+    content -- str, content of the log file.
+
+    """
+    return _read_file(log_path)
+
+
+def _read_log(log_path):
+    """Reads the content of a log file
+
+    The content is cached and read again only if the modification time of
+    the file changes.
+
+    Arguments:
+    log_path -- str, path to the log file.
+
+    Return:
+    content -- str, content of the log file.
+
+    Raises:
+    FileNotFoundError -- if the log file is not found.
+    RuntimeError -- if there was a problem reading the log file
+
+    """
+    try:
+        try:
+            mtime_ns = os.stat(log_path).st_mtime_ns
+        except OSError:
+            return _read_file(log_path)  # Not cached, open reports errors
+
+        return _read_cached_file(log_path, mtime_ns)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"log file at {log_path} not found.") from e
+    except Exception as e:
+        raise RuntimeError(f"error reading log file: {e}") from e
 
 
 def get_print_timestep(log_path):
@@ -35,20 +103,14 @@ def get_print_timestep(log_path):
 
     """
     try:
-        with open(log_path, "r") as log_file:
-            for line in log_file:
-                if "print timestep" in line:
-                    # Use regex to extract numerical value
-                    match = re.search(
-                        r"print timestep:\s*(\d+\.*\d*)\s*ms",
-                        line,
-                    )
-                    if match:
-                        return float(match.group(1))
+        match = PRINT_TIMESTEP_RE.search(_read_log(log_path))
     except FileNotFoundError as e:
-        raise FileNotFoundError(f"log file at {log_path} not found.") from e
-    except Exception as e:
-        raise RuntimeError(f"error reading log file: {e}") from e
+        raise e
+    except RuntimeError as e:
+        raise e
+
+    if match:
+        return float(match.group(1))
 
     # If no valid line is found
     raise ValueError("print timestep not found in the log file.")
@@ -70,14 +132,14 @@ def get_mesh_name(log_path):
 
     """
     try:
-        with open(log_path, "r") as log_file:
-            for line in log_file:
-                if "mesh" in line:
-                    return line.split(":")[1].strip()
+        match = MESH_RE.search(_read_log(log_path))
     except FileNotFoundError as e:
-        raise FileNotFoundError(f"log file at {log_path} not found.") from e
-    except Exception as e:
-        raise RuntimeError(f"error reading log file: {e}") from e
+        raise e
+    except RuntimeError as e:
+        raise e
+
+    if match and ":" in match.group():
+        return match.group().split(":")[1].strip()
 
     # If no valid line is found
     raise ValueError("mesh name not found in the log file.")
@@ -100,26 +162,254 @@ def get_param_value(log_path, parameter):
 
     """
     try:
-        with open(log_path, "r") as log_file:
-            for line in log_file:
-                if parameter in line:
-                    return float(line.split(":")[1].strip())
+        match = re.search(
+            rf"^.*{re.escape(parameter)}.*$",
+            _read_log(log_path),
+            re.M,
+        )
     except FileNotFoundError as e:
-        raise FileNotFoundError(f"log file at {log_path} not found.") from e
-    except Exception as e:
-        raise RuntimeError(f"error reading log file: {e}") from e
+        raise e
+    except RuntimeError as e:
+        raise e
+
+    if match and ":" in match.group():
+        return float(match.group().split(":")[1].strip())
 
     # If no valid line is found
     raise ValueError("mesh name not found in the log file.")
 
 
-def load_data(data_path, log_path, delimiter=","):
+@contextmanager
+def _csv_errors(data_path):
+    """Converts the errors raised while reading a csv file
+
+    Arguments:
+    data_path -- str, path to the data file.
+
+    Return:
+
+    Raises:
+    FileNotFoundError -- if the data file is not found.
+    pd.errors.EmptyDataError -- if the data file is empty.
+    pd.errors.ParserError -- if the data file cannot be parsed.
+    RuntimeError -- if an error occurs during parsing.
+
+    """
+    try:
+        yield
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"data file at {data_path} not found.") from e
+    except pd.errors.EmptyDataError as e:
+        raise pd.errors.EmptyDataError("file is empty.") from e
+    except pd.errors.ParserError as e:
+        raise pd.errors.ParserError("could not parse file.") from e
+    except Exception as e:
+        raise RuntimeError(f"an unexpected error occurred: {e}") from e
+
+
+def _count_rows(data_path):
+    """Counts the number of data rows in a csv file
+
+    Arguments:
+    data_path -- str, path to the data file.
+
+    Return:
+    nb_rows -- int, number of lines in the file without the header.
+
+    """
+    nb_lines = 0
+    last = b""
+
+    with open(data_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            nb_lines += block.count(b"\n")
+            last = block[-1:]
+
+    if last and last != b"\n":
+        nb_lines += 1  # Last line without a newline
+
+    return max(nb_lines - 1, 0)
+
+
+def _get_cell_ids(point_ids, probe_size=1024):
+    """Gets the cell ids from the interleaved point ids
+
+    The cells are interleaved at each timestep, the cell ids are the ids
+    found before the first id repeats and are in the order of the cells.
+
+    Arguments:
+    point_ids -- ndarray, point ids of the rows.
+    probe_size -- int, number of rows searched for a repeat, default 1024.
+
+    Return:
+    cell_ids -- ndarray, cell ids in order, None if the first id does not
+    repeat in the searched rows.
+
+    """
+    repeats = np.flatnonzero(point_ids[1:probe_size] == point_ids[0])
+
+    if repeats.size == 0:
+        return None
+
+    # Copy so that the ids do not keep the whole column in memory
+    return point_ids[: repeats[0] + 1].copy()
+
+
+def _is_interleaved(point_ids, cell_ids, offset=0):
+    """Checks that the point ids cycle through the cell ids
+
+    Arguments:
+    point_ids -- ndarray, point ids of the rows.
+    cell_ids -- ndarray, cell ids in order.
+    offset -- int, index of the first row in the file, default 0.
+
+    Return:
+    interleaved -- bool, True if the rows follow the order of cell_ids.
+
+    """
+    idx = (np.arange(point_ids.size) + offset) % len(cell_ids)
+    return np.array_equal(point_ids, cell_ids[idx])
+
+
+def _group_by_cell(V, point_ids, cell_ids):
+    """Reorders the membrane potential of rows that are not interleaved
+
+    The rows are stable sorted by cell so that the timesteps of each cell
+    stay in the order of the file.
+
+    Arguments:
+    V -- ndarray, membrane potential values of the rows.
+    point_ids -- ndarray, point ids of the rows.
+    cell_ids -- ndarray, cell ids in order.
+
+    Return:
+    V -- ndarray, membrane potential values, one column per cell.
+
+    Raises:
+    ValueError -- if the cells do not have the same number of rows.
+
+    """
+    order = np.argsort(cell_ids)
+    cells = order[np.searchsorted(cell_ids, point_ids, sorter=order)]
+
+    if np.any(np.bincount(cells) != V.size // len(cell_ids)):
+        raise ValueError("cells do not have the same number of timesteps.")
+
+    perm = np.argsort(cells, kind="stable")
+    return V[perm].reshape(len(cell_ids), -1).T
+
+
+def _read_csv_chunks(data_path, delimiter, columns, chunksize, dtypes):
+    """Reads the membrane potential and point ids of a csv file by chunks
+
+    Only the membrane potential values are kept in memory, the cell ids
+    are found in the first chunk. The point ids are only kept if no id
+    repeats in the first chunk, to find the cell ids once all the rows
+    are read. The rows have to be interleaved as they are not grouped by
+    cell.
+
+    Arguments:
+    data_path -- str, path to the data file.
+    delimiter -- str, delimiter for the csv file.
+    columns -- list[str], membrane potential and point ID columns.
+    chunksize -- int, number of rows read at once.
+    dtypes -- dict, type of each column.
+
+    Return:
+    V -- ndarray, membrane potential values of all the rows.
+    cell_ids -- ndarray, cell ids in order.
+    interleaved -- bool, False if the rows do not follow the cell ids.
+
+    """
+    V = np.empty(_count_rows(data_path), dtype=dtypes[columns[0]])
+    cell_ids = None
+    chunk_ids = []
+    interleaved = True
+    offset = 0
+
+    with pd.read_csv(
+        data_path,
+        delimiter=delimiter,
+        usecols=columns,
+        dtype=dtypes,
+        engine="c",
+        chunksize=chunksize,
+    ) as reader:
+        for chunk in reader:
+            V[offset:offset + len(chunk)] = chunk[columns[0]].to_numpy()
+            point_ids = chunk[columns[1]].to_numpy()
+
+            if offset == 0:
+                cell_ids = _get_cell_ids(point_ids)
+
+            if cell_ids is None:
+                chunk_ids.append(point_ids)
+            elif interleaved:
+                interleaved = _is_interleaved(point_ids, cell_ids, offset)
+
+            offset += len(chunk)
+
+    if cell_ids is None:
+        point_ids = np.concatenate(chunk_ids)
+        cell_ids = pd.unique(point_ids)
+        interleaved = _is_interleaved(point_ids, cell_ids)
+
+    return V[:offset], cell_ids, interleaved
+
+
+def _load_npz_data(data_path, dtype):
+    """Loads the data saved in a npz file by save_data
+
+    Arguments:
+    data_path -- str, path to the npz file.
+    dtype -- np.dtype, type of the membrane potential values.
+
+    Return:
+    V -- ndarray, membrane potential values.
+    t -- ndarray, timestep values.
+    cell_ids -- ndarray, cell ids.
+
+    Raises:
+    FileNotFoundError -- if the data file is not found.
+    ValueError -- if an array is missing in the npz file.
+
+    """
+    try:
+        with np.load(data_path) as data:
+            for key in ("V", "t", "cell_ids"):
+                if key not in data.files:
+                    raise ValueError(f"missing array {key} in {data_path}.")
+
+            return (
+                data["V"].astype(dtype, copy=False),
+                data["t"],
+                data["cell_ids"],
+            )
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"data file at {data_path} not found.") from e
+
+
+def load_data(
+    data_path,
+    log_path,
+    delimiter=",",
+    dtype=np.float32,
+    chunksize=None,
+):
     """Loads the data from a csv file
 
+    Only the membrane potential and point ID columns are parsed, the time
+    values are recreated from the print timestep of the log file. Data
+    saved with save_data in a npz file is loaded directly without the log.
+
     Arguments:
     data_path -- str, path to the data file.
     log_path -- str, path to the log file of the simulation.
     delimiter -- str, delimiter for the csv file, default value ,.
+    dtype -- np.dtype, type of the membrane potential values, single
+    precision is enough for the comparison metrics, default np.float32.
+    chunksize -- int, if given the file is read by chunks of chunksize rows
+    to limit the memory used, default None.
 
     Return:
     V -- ndarray, membrane potential values.
@@ -135,18 +425,63 @@ def load_data(data_path, log_path, delimiter=","):
     RuntimeError -- if there was a problem reading the log file
     ValueError -- if the print timestep value is not found or cannot be parsed.
     ValueError -- if the required column is missing in the CSV file.
+    ValueError -- if the cells do not have the same number of timesteps.
+    ValueError -- if the rows are not interleaved when read by chunks.
+    ValueError -- if an array is missing in the npz file.
+    IndexError -- if the point ID column is missing in the CSV file.
 
     """
-    try:
-        df = pd.read_csv(data_path, delimiter=delimiter)
-    except FileNotFoundError as e:
-        raise FileNotFoundError(f"data file at {data_path} not found.") from e
-    except pd.errors.EmptyDataError as e:
-        raise pd.errors.EmptyDataError("file is empty.") from e
-    except pd.errors.ParserError as e:
-        raise pd.errors.ParserError("could not parse file.") from e
-    except Exception as e:
-        raise RuntimeError(f"an unexpected error occurred: {e}") from e
+    if data_path.endswith(".npz"):
+        return _load_npz_data(data_path, dtype)
+
+    with _csv_errors(data_path):
+        columns = pd.read_csv(data_path, delimiter=delimiter, nrows=0).columns
+
+    # Check the time, membrane potential and point ID columns
+    if len(columns) < 3:
+        raise IndexError("missing point IDs in vtu file.")
+
+    if columns[2] != "vtkOriginalPointIds":
+        raise ValueError(f"incorrect column {columns[2]}")
+
+    # Paraview export of single cell data
+    columns = columns[1:3]
+    dtypes = {columns[0]: dtype, columns[1]: np.int64}
+
+    with _csv_errors(data_path):
+        if chunksize is None:
+            df = pd.read_csv(
+                data_path,
+                delimiter=delimiter,
+                usecols=columns,
+                dtype=dtypes,
+                engine="c",
+                memory_map=True,
+                low_memory=False,
+            )
+            V = df[columns[0]].to_numpy(dtype=dtype)
+            point_ids = df[columns[1]].to_numpy()
+        else:
+            V, cell_ids, interleaved = _read_csv_chunks(
+                data_path,
+                delimiter,
+                columns,
+                chunksize,
+                dtypes,
+            )
+
+    # Rows are normally interleaved, otherwise they are grouped by cell
+    if chunksize is None:
+        cell_ids = _get_cell_ids(point_ids)
+
+        if cell_ids is None or not _is_interleaved(point_ids, cell_ids):
+            cell_ids = pd.unique(point_ids)
+
+            if not _is_interleaved(point_ids, cell_ids):
+                V = _group_by_cell(V, point_ids, cell_ids)
+
+    elif not interleaved:
+        raise ValueError("rows are not interleaved, read without chunksize.")
 
     # Get print timestep
     try:
@@ -158,56 +493,157 @@ def load_data(data_path, log_path, delimiter=","):
     except ValueError as e:
         raise e
 
-    # Get column names
-    columns = df.columns
+    nb_cells = len(cell_ids)
+    nb_timesteps = V.size // nb_cells
 
-    # Extract time and membrane potential
-    time_vals = df[columns[0]].to_numpy()
-    V = df[columns[1]].to_numpy()
+    # Cells are interleaved at each timestep, one column per cell
+    V = V.reshape(nb_timesteps, nb_cells)
 
-    if len(columns) < 3:
-        raise IndexError("missing point IDs in vtu file.")
+    # Create correct timesteps in seconds
+    t = np.linspace(0, (nb_timesteps - 1) * timestep * 1e-3, nb_timesteps)
 
-    if columns[2] == "vtkOriginalPointIds":
-        # Paraview export of single cell data
-        cell_ids = np.unique(df[columns[2]].to_numpy())
-        nb_cells = len(cell_ids)
-        nb_timesteps = time_vals.size // nb_cells
-        tmp_V = np.zeros((nb_timesteps, nb_cells))  # Temporary placeholder
+    return V, t, cell_ids[0:3].copy()
 
-        for i in range(nb_cells):
-            # Get the output of each cell
-            idx = np.arange(i, V.size, nb_cells)
-            tmp_V[:, i] = V[idx]
 
-    else:
-        raise ValueError(f"incorrect column {columns[2]}")
+def is_cache_valid(cache_path, *source_paths):
+    """Checks if a cache file is more recent than the files it was built from
 
-    V = tmp_V  # Reset V for plotting
-    # Create correct timesteps in seconds
-    t = np.linspace(0, (nb_timesteps - 1) * timestep * 1e-3, nb_timesteps)
+    Arguments:
+    cache_path -- str, path to the cache file.
+    source_paths -- str, paths to the source files of the cache.
+
+    Return:
+    valid -- bool, True if the cache exists and is up to date.
+
+    """
+    try:
+        cache_time = os.path.getmtime(cache_path)
+        return all(
+            os.path.getmtime(path) <= cache_time for path in source_paths
+        )
+    except OSError:
+        return False
 
-    return V, t, cell_ids[0:3]
+
+def get_cache_key(*source_paths):
+    """Gets the key identifying the state of the source files of a cache
+
+    Arguments:
+    source_paths -- str, paths to the source files of the cache.
+
+    Return:
+    key -- np.array[int], modification time in ns and size of each file.
+
+    Raises:
+    OSError -- if one of the source files does not exist.
+
+    """
+    stats = [os.stat(path) for path in source_paths]
+    return np.array(
+        [[stat.st_mtime_ns, stat.st_size] for stat in stats], dtype=np.int64
+    )
+
+
+def save_cache(cache_path, compress=False, **arrays):
+    """Saves arrays in a npz or npy cache file
+
+    The file is written to a temporary file first and then moved in place
+    so that an interrupted write does not leave a corrupted cache. If the
+    cache path ends with .npy a single array is saved, which can then be
+    loaded with mmap_mode.
+
+    Arguments:
+    cache_path -- str, path to the cache file.
+    compress -- bool, compresses the arrays of a npz file, default False.
+    arrays -- np.array, arrays to save with their keyword as name.
+
+    Return:
+
+    Raises:
+    ValueError -- if several arrays are saved in a npy file.
+    OSError -- if the cache file cannot be written.
+
+    """
+    if cache_path.endswith(".npy") and len(arrays) != 1:
+        raise ValueError("a npy cache file can only contain one array.")
+
+    tmp_path = cache_path + ".tmp"
+
+    try:
+        with open(tmp_path, "wb") as f:
+            if cache_path.endswith(".npy"):
+                np.save(f, *arrays.values())
+            elif compress:
+                np.savez_compressed(f, **arrays)
+            else:
+                np.savez(f, **arrays)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise e
+
+
+def save_data(data_path, V, t, cell_ids):
+    """Saves extracted data in a compressed npz file
+
+    The file can be loaded with load_data in place of the csv file, the
+    time values are saved so the log file is not needed.
+
+    Arguments:
+    data_path -- str, path to the npz file.
+    V -- ndarray, membrane potential values.
+    t -- ndarray, timestep values.
+    cell_ids -- ndarray, cell ids.
+
+    Return:
+
+    Raises:
+    ValueError -- if the data path does not end with .npz.
+    OSError -- if the data file cannot be written.
+
+    """
+    if not data_path.endswith(".npz"):
+        raise ValueError("data path should end with .npz.")
+
+    try:
+        save_cache(data_path, compress=True, V=V, t=t, cell_ids=cell_ids)
+    except OSError as e:
+        raise e
 
 
 def get_range(num_range):
-    """Converts the input range into a list of numbers
+    """Converts the input range into a sequence of numbers
+
+    A range of the form start-end is returned as a range object rather
+    than a list, it supports len, indexing and iteration.
 
     Arguments:
-    num_range -- str, range of number from the input argument.
+    num_range -- str or list[str], range of number from the input argument.
 
     Return:
-    num_list -- list[int], list of numbers extracted from the range.
+    num_list -- int | range | list[int], numbers extracted from the range.
+
+    Raises:
+    ValueError -- if the range is not a number or a range of numbers.
 
     """
+    if isinstance(num_range, str):
+        # Single argument, not a list of characters
+        num_range = [num_range]
+
     if len(num_range) == 1:
-        split = num_range[0].split("-")
-        if len(split) == 1:
+        match = RANGE_RE.fullmatch(num_range[0])
+
+        if match is None:
+            raise ValueError(f"invalid range {num_range[0]}")
+
+        if match.group(2) is None:
             # Single number
-            num_list = int(num_range[0])
+            num_list = int(match.group(1))
         else:
             # Range
-            num_list = [i for i in range(int(split[0]), int(split[1]) + 1)]
+            num_list = range(int(match.group(1)), int(match.group(2)) + 1)
     else:
         # Convert to list to int
         num_list = [int(i) for i in num_range]
@@ -230,10 +666,47 @@ def extract_spike_times(signal, time, height=-50):
     Raises:
 
     """
+    from scipy.signal import find_peaks  # Slow import, only when needed
+
     peaks, _ = find_peaks(signal, height=height)
     return time[peaks]
 
 
+def get_first_spike_idx(signal, height=-50, window=1024):
+    """Gets the index of the first spike of a signal
+
+    Peaks are searched in prefixes of the signal that double in size, so
+    that only the start of the signal is read when the first spike is
+    early. A peak found in a prefix is a peak of the full signal and peaks
+    are found in order, the first one is the same as with find_peaks.
+
+    Arguments:
+    signal -- np.array, signal amplitudes over time.
+    height -- float, minimum height for peaks to be considered spikes.
+    window -- int, size of the first prefix, default value 1024.
+
+    Returns:
+    idx -- int, index of the first spike, -1 if no spike is found.
+
+    Raises:
+
+    """
+    from scipy.signal import find_peaks  # Slow import, only when needed
+
+    size = window
+
+    while True:
+        peaks, _ = find_peaks(signal[:size], height=height)
+
+        if len(peaks) > 0:
+            return int(peaks[0])
+
+        if size >= len(signal):
+            return -1
+
+        size *= 2
+
+
 def create_spike_train(spike_times, t_stop):
     """Convert spike times to a SpikeTrain object
 
@@ -247,7 +720,11 @@ def create_spike_train(spike_times, t_stop):
     Raises:
 
     """
-    return SpikeTrain(spike_times * quant.s, t_stop=t_stop * quant.s)
+    import quantities as quant
+    from neo.core import SpikeTrain  # Slow import, only when needed
+
+    # Units are given to SpikeTrain to avoid creating quantity arrays
+    return SpikeTrain(spike_times, units=quant.s, t_stop=t_stop)
 
 
 def estimate_velocity(V, t, mesh_name):
@@ -267,15 +744,15 @@ def estimate_velocity(V, t, mesh_name):
     ValueError -- if no spikes were found at one of the ends of the horn.
 
     """
-    cev_spikes = extract_spike_times(V[:, 2], t)
-    ova_spikes = extract_spike_times(V[:, 0], t)
+    cev_idx = get_first_spike_idx(V[:, 2])
+    ova_idx = get_first_spike_idx(V[:, 0])
 
-    if len(cev_spikes) == 0:
+    if cev_idx < 0:
         raise ValueError("no spikes found at the cervical end")
 
-    if len(ova_spikes) == 0:
+    if ova_idx < 0:
         raise ValueError("no spikes found at the ovarian end")
 
-    velocity = HORN_LENGTH_DICT[mesh_name] / (cev_spikes[0] - ova_spikes[0])
+    velocity = HORN_LENGTH_DICT[mesh_name] / (t[cev_idx] - t[ova_idx])
 
     print(f"Propagation velocity: {velocity:.2f} mm/s")
@@ -11,6 +11,8 @@ This file contains test cases for the functions:
 - _fct_setup
 - _data_extract
 - _reorder_V
+- _ordered_data_extract
+- _map_sims
 - resolution_fct
 - cell_fct
 - parameter_fct
@@ -20,7 +22,9 @@ The tests cover various scenarios including valid inputs, invalid inputs,
 and edge cases.
 """
 
+import os
 import numpy as np
+import pandas as pd
 import pytest
 from unittest.mock import patch
 from symprobe import constants
@@ -28,6 +32,8 @@ from symprobe.extract_script_fct import (
     _fct_setup,
     _data_extract,
     _reorder_V,
+    _ordered_data_extract,
+    _map_sims,
     resolution_fct,
     cell_fct,
     parameter_fct,
@@ -39,8 +45,9 @@ from symprobe.extract_script_fct import (
     "rng, estrus, expected_nb_sims, expected_estrus",
     [
         ("5", "proestrus", [5], ["proestrus"]),
-        (["1-3"], "estrus", [1, 2, 3], ["estrus"]),
-        (["1-3"], "all", [1, 2, 3], constants.ESTRUS),
+        ("12", "proestrus", [12], ["proestrus"]),
+        (["1-3"], "estrus", range(1, 4), ["estrus"]),
+        (["1-3"], "all", range(1, 4), constants.ESTRUS),
     ],
 )
 def test_fct_setup(rng, estrus, expected_nb_sims, expected_estrus):
@@ -72,6 +79,72 @@ def test_data_extract(mock_load_data):
     assert np.array_equal(cell_ids, np.array([10, 20, 30]))
 
 
+@patch("symprobe.utils.load_data")
+def test_data_extract_cache(mock_load_data, tmp_path):
+    mock_load_data.return_value = (
+        np.array([[1.0, 2.0], [3.0, 4.0]]),
+        np.array([0, 1]),
+        np.array([10, 20, 30]),
+    )
+    (tmp_path / "extract").mkdir()
+    (tmp_path / "log").mkdir()
+    (tmp_path / "extract" / "sim_001.csv").write_text("")
+    (tmp_path / "log" / "sim_001.log").write_text("")
+
+    _data_extract("sim", 1, str(tmp_path), ",")
+    V, t, cell_ids, _ = _data_extract("sim", 1, str(tmp_path), ",")
+
+    mock_load_data.assert_called_once()
+    assert (tmp_path / "extract" / "sim_001.cache.npz").exists()
+    assert not (tmp_path / "extract" / "sim_001.npz").exists()
+    assert isinstance(V, np.memmap)
+    assert np.array_equal(V, np.array([[1.0, 2.0], [3.0, 4.0]]))
+    assert np.array_equal(cell_ids, np.array([10, 20, 30]))
+
+
+@patch("symprobe.utils.load_data")
+def test_data_extract_cache_outdated(mock_load_data, tmp_path):
+    mock_load_data.return_value = (
+        np.array([[1.0, 2.0], [3.0, 4.0]]),
+        np.array([0, 1]),
+        np.array([10, 20, 30]),
+    )
+    (tmp_path / "extract").mkdir()
+    (tmp_path / "log").mkdir()
+    data_path = tmp_path / "extract" / "sim_001.csv"
+    data_path.write_text("")
+    (tmp_path / "log" / "sim_001.log").write_text("")
+
+    _data_extract("sim", 1, str(tmp_path), ",")
+    # Replace the csv but keep its old modification time
+    mtime = os.stat(data_path).st_mtime_ns
+    data_path.write_text("new data")
+    os.utime(data_path, ns=(mtime, mtime))
+    _data_extract("sim", 1, str(tmp_path), ",")
+
+    assert mock_load_data.call_count == 2
+
+
+def test_data_extract_not_interleaved(tmp_path):
+    (tmp_path / "extract").mkdir()
+    (tmp_path / "log").mkdir()
+    pd.DataFrame(
+        {
+            "Time": np.zeros(6),
+            "V": [10, 11, -40, -41, 30, 29],
+            "vtkOriginalPointIds": [30, 30, 10, 10, 20, 20],
+        }
+    ).to_csv(tmp_path / "extract" / "sim_001.csv", index=False)
+    (tmp_path / "log" / "sim_001.log").write_text("print timestep: 0.1 ms\n")
+
+    with patch("symprobe.extract_script_fct.LOAD_CHUNKSIZE", 4):
+        V, t, cell_ids, _ = _data_extract("sim", 1, str(tmp_path), ",")
+
+    np.testing.assert_array_equal(cell_ids, [30, 10, 20])
+    np.testing.assert_array_equal(V, [[10, -40, 30], [11, -41, 29]])
+    assert len(t) == 2
+
+
 @patch("symprobe.utils.load_data", side_effect=Exception("File not found"))
 def test_data_extract_failure(mock_load_data):
     with pytest.raises(Exception, match="File not found"):
@@ -89,6 +162,14 @@ def test_reorder_V():
     assert np.array_equal(reordered_V, expected_V)
 
 
+def test_reorder_V_in_order():
+    V = np.array([[1, 2, 3], [4, 5, 6]])
+
+    reordered_V = _reorder_V(V, np.array([10, 20, 30]), [10, 20, 30])
+
+    assert reordered_V is V
+
+
 def test_reorder_V_invalid():
     with pytest.raises(
         ValueError, match="cell ids and ordered ids should have same length"
@@ -97,6 +178,51 @@ def test_reorder_V_invalid():
                    np.array([10, 20]), np.array([30]))
 
 
+def test_reorder_V_missing_ids():
+    V = np.array([[1, 2, 3], [4, 5, 6]])
+    cell_ids = np.array([10, 20, 30])
+
+    with pytest.raises(ValueError, match=r"ordered ids \[99\] not found"):
+        _reorder_V(V, cell_ids, np.array([10, 20, 99]))
+
+    with pytest.raises(ValueError, match="ordered ids should be unique"):
+        _reorder_V(V, cell_ids, np.array([10, 10, 20]))
+
+
+@patch("symprobe.utils.load_data")
+def test_ordered_data_extract(mock_load_data):
+    mock_load_data.return_value = (
+        np.array([[1, 2, 3], [4, 5, 6]]),
+        np.array([0, 1]),
+        np.array([10, 20, 30]),
+    )
+
+    with (
+        patch("symprobe.utils.get_mesh_name", return_value="mesh_1"),
+        patch.dict("symprobe.constants.PTS_DICT", {"mesh_1": [30, 10, 20]}),
+    ):
+        V, t, mesh_name, log_path = _ordered_data_extract(
+            "sim", 1, "/fake/path", ",")
+
+    assert mesh_name == "mesh_1"
+    assert log_path == "/fake/path/log/sim_001.log"
+    assert np.array_equal(V, np.array([[3, 1, 2], [6, 4, 5]]))
+
+
+def test_map_sims():
+    assert _map_sims(lambda sim_nb: sim_nb * 2, [3, 1, 2]) == [6, 2, 4]
+
+
+def test_map_sims_failure():
+    def extract(sim_nb):
+        if sim_nb == 2:
+            raise FileNotFoundError("sim_002.csv")
+        return sim_nb
+
+    with pytest.raises(FileNotFoundError, match="sim_002.csv"):
+        _map_sims(extract, [1, 2, 3])
+
+
 @patch("symprobe.utils.load_data")
 @patch("symprobe.constants.RES_DICT", {"mesh_1": 100})
 @patch("symprobe.plots.plot_resolution_convergence")
@@ -111,6 +237,27 @@ def test_resolution_fct(mock_plot, mock_load_data):
     mock_plot.assert_called_once()
 
 
+@patch("symprobe.utils.load_data")
+@patch("symprobe.constants.RES_DICT", {"mesh_1": 100})
+@patch("symprobe.plots.plot_resolution_convergence")
+def test_resolution_fct_length_mismatch(mock_plot, mock_load_data):
+    # Simulations are loaded concurrently, return the data based on path
+    mock_load_data.side_effect = lambda data_path, *args, **kwargs: (
+        (np.array([[1.0, 2.0], [3.0, 4.0]]), np.array([0, 1]), np.array([1]))
+        if data_path.endswith("sim_002.csv")
+        else (np.array([[1.0, 2.0]]), np.array([0]), np.array([1]))
+    )
+
+    with (
+        patch("symprobe.utils.get_mesh_name", return_value="mesh_1"),
+        pytest.raises(ValueError, match="simulation 2 has 2 timesteps"),
+    ):
+        resolution_fct("/path", "estrus_data", "rmse",
+                       ["1-2"], "sim", "proestrus", ",")
+
+    mock_plot.assert_not_called()
+
+
 @patch("symprobe.utils.load_data")
 @patch("symprobe.plots.plot_cell_data")
 def test_cell_fct(mock_plot, mock_load_data):
@@ -118,16 +265,94 @@ def test_cell_fct(mock_plot, mock_load_data):
         np.array([[-70, -70, -70], [-50, -70, -60],
                  [-70, -50, -50], [-70, -70, -70]]),
         np.array([0, 1, 2, 3]),
-        np.array([10, 20, 30]),
+        np.array([1595, 2192, 2908]),
     )
 
     with (
         patch("symprobe.utils.get_mesh_name",
               return_value="uterus_scaffold_scaled_3"),
     ):
-        cell_fct("/path", "1", "sim", "proestrus", ",")
+        cell_fct("/path", ["1-2"], "sim", "proestrus", ",")
+
+    # Each simulation is saved in its own file
+    names = [call.kwargs["name"] for call in mock_plot.call_args_list]
+    assert names == ["cell_data_proestrus_001", "cell_data_proestrus_002"]
+
+
+@pytest.fixture
+def stages_dir(tmp_path):
+    # Two simulations per stage, the ovarian traces differ by the stage rank
+    ids = constants.PTS_DICT["uterus_scaffold_scaled_3"]
+
+    for k, stage in enumerate(constants.ESTRUS):
+        estrus_path = tmp_path / f"{stage}_estrus_data"
+        (estrus_path / "extract").mkdir(parents=True)
+        (estrus_path / "log").mkdir()
+
+        for sim_nb in (1, 2):
+            V = np.array([
+                np.array([-70.0, 0.0, -70.0, -70.0]) + (k + 1) * sim_nb,
+                np.full(4, -70.0),
+                np.array([-70.0, -70.0, 0.0, -70.0]),
+            ]).T
+            pd.DataFrame(
+                {
+                    "Time": np.repeat(np.arange(4), 3),
+                    "V": V.ravel(),
+                    "vtkOriginalPointIds": np.tile(ids, 4),
+                }
+            ).to_csv(estrus_path / "extract" / f"sim_{sim_nb:03}.csv",
+                     index=False)
+            (estrus_path / "log" / f"sim_{sim_nb:03}.log").write_text(
+                "print timestep: 0.1 ms\n"
+                "mesh: uterus_scaffold_scaled_3\n"
+                f"param: {0.5 * sim_nb}\n"
+            )
+
+    return tmp_path
+
+
+@patch("symprobe.plots.plot_resolution_convergence")
+def test_resolution_fct_all_stages(mock_plot, stages_dir):
+    resolution_fct(str(stages_dir), "estrus_data", "rmse",
+                   ["1-2"], "sim", "all", ",")
+
+    comp_dict, nb_mesh_eles, _ = mock_plot.call_args.args
+    assert list(comp_dict) == list(constants.ESTRUS)
+
+    for k, stage in enumerate(constants.ESTRUS):
+        np.testing.assert_allclose(comp_dict[stage], [k + 1, 0.0])
+
+    np.testing.assert_array_equal(nb_mesh_eles, [14976, 14976])
 
-    mock_plot.assert_called()
+
+@patch("symprobe.plots.plot_parameter_comparison")
+@patch("symprobe.plots.plot_spike_propagation")
+def test_parameter_fct_all_stages(
+    mock_spike_plot, mock_param_plot, stages_dir, capsys
+):
+    parameter_fct(str(stages_dir), "param", "estrus_data", "rmse",
+                  ["1-2"], "sim", "all", ",")
+
+    comp_dict, param_values, _, _ = mock_param_plot.call_args.args
+    spike_dict = mock_spike_plot.call_args.args[0]
+
+    for k, stage in enumerate(constants.ESTRUS):
+        np.testing.assert_allclose(comp_dict[stage], [0.0, k + 1])
+        np.testing.assert_array_equal(spike_dict[stage], [1, 1])
+
+    np.testing.assert_array_equal(param_values, [0.5, 1.0])
+
+    # The output of each stage is printed as a block, in the stage order
+    lines = capsys.readouterr().out.splitlines()
+    assert [line for line in lines if line.startswith("Estrus")] == [
+        f"Estrus stage: {stage}" for stage in constants.ESTRUS
+    ]
+    for stage in constants.ESTRUS:
+        start = lines.index(f"Estrus stage: {stage}")
+        assert lines[start + 1:start + 3] == [
+            "Propagation velocity: 200000.00 mm/s"
+        ] * 2
 
 
 @patch("symprobe.utils.load_data")
@@ -144,7 +369,7 @@ def test_parameter_fct(
         np.array([[-70, -70, -70], [-50, -70, -60],
                  [-70, -50, -50], [-70, -70, -70]]),
         np.array([0, 1, 2, 3]),
-        np.array([10, 20, 30]),
+        np.array([1595, 2192, 2908]),
     )
 
     with (
@@ -167,7 +392,50 @@ def test_parameter_fct(
 
 
 @patch("symprobe.utils.load_data")
-@patch("symprobe.metrics.compute_comparison", return_value=0.9)
+@patch("symprobe.utils.get_param_value", return_value=0.5)
+@patch("symprobe.utils.estimate_velocity")
+@patch("symprobe.utils.extract_spike_times")
+@patch("symprobe.plots.plot_parameter_comparison")
+@patch("symprobe.plots.plot_spike_propagation")
+def test_parameter_fct_no_spikes(
+    mock_spike_plot,
+    mock_param_plot,
+    mock_spike_times,
+    mock_velocity,
+    mock_get_param,
+    mock_load_data,
+):
+    mock_load_data.return_value = (
+        np.array([[-70, -70, -70], [-50, -70, -60],
+                 [-70, -50, -50], [-70, -70, -70]]),
+        np.array([0, 1, 2, 3]),
+        np.array([1595, 2192, 2908]),
+    )
+
+    with (
+        patch("symprobe.utils.get_mesh_name",
+              return_value="uterus_scaffold_scaled_3"),
+    ):
+        parameter_fct(
+            "/path",
+            "param",
+            "estrus_data",
+            "rmse",
+            "1",
+            "sim",
+            "proestrus",
+            ",",
+            compute_spikes=False,
+        )
+
+    mock_param_plot.assert_called()
+    mock_spike_plot.assert_not_called()
+    mock_spike_times.assert_not_called()
+
+
+@patch("symprobe.utils.load_data")
+@patch("symprobe.metrics.compute_comparison_batch",
+       return_value=np.array([0.9, 0.9]))
 @patch("symprobe.plots.plot_cell_comparison")
 def test_comparison_fct(mock_plot, mock_metric, mock_load_data):
     mock_load_data.return_value = (
@@ -187,11 +455,17 @@ def test_comparison_fct(mock_plot, mock_metric, mock_load_data):
             "realistic",
             "ideal",
             "sub",
-            "1",
+            ["1-2"],
             "sim",
             "proestrus",
             ",",
         )
 
-    mock_plot.assert_called()
+    # Each simulation and cell is saved in its own file
+    names = [call.kwargs["name"] for call in mock_plot.call_args_list]
+    assert names == [
+        f"cell_comparison_proestrus_{sim_nb:03}_{j}"
+        for sim_nb in (1, 2)
+        for j in range(2)
+    ]
     mock_metric.assert_called()
@@ -13,7 +13,11 @@ This file contains test cases for the functions:
 - compute_mae
 - compute_mse
 - compute_van_rossum_distance
+- compute_vrd_batch
+- compute_vrd_matrix
 - compute_comparison
+- compute_comparison_batch
+- compute_comparison_matrix
 
 The tests cover various scenarios including valid inputs, invalid inputs,
 and edge cases.
@@ -21,20 +25,29 @@ and edge cases.
 
 import pytest
 import numpy as np
+import symprobe.utils
 from symprobe.metrics import (
     check_broadcasting,
     compute_rmse,
     compute_mae,
     compute_mse,
     compute_van_rossum_distance,
+    compute_vrd_batch,
+    compute_vrd_matrix,
     compute_comparison,
+    compute_comparison_batch,
+    compute_comparison_matrix,
 )
+from symprobe.utils import extract_spike_times
 from unittest.mock import patch
+from elephant.spike_train_dissimilarity import van_rossum_distance
+from neo.core import SpikeTrain
+import quantities as quant
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_data():
-    return {
+    data = {
         "simple": (np.array([1, 2, 3]), np.array([2, 3, 4])),
         "multidim": (np.array([[1, 2], [3, 4]]), np.array([[2, 3], [4, 5]])),
         "broadcast": (np.array([[1, 2], [3, 4]]), np.array([1, 2])),
@@ -45,6 +58,13 @@ def sample_data():
         "large": (np.array([1e6, 2e6, 3e6]), np.array([2e6, 3e6, 4e6])),
     }
 
+    # The data is shared by all tests, prevent accidental modifications
+    for value in data.values():
+        for arr in value if isinstance(value, tuple) else (value,):
+            arr.flags.writeable = False
+
+    return data
+
 
 # check_broadcasting tests
 
@@ -78,24 +98,52 @@ def test_compute_metrics_perfect_prediction():
         assert func(y, y) == 0
 
 
+@pytest.mark.parametrize("func", [compute_rmse, compute_mae, compute_mse])
+def test_compute_metrics_python_float(func, sample_data):
+    y_true, y_pred = sample_data["simple"]
+    assert type(func(y_true, y_pred)) is float
+
+
+@pytest.mark.parametrize("func", [compute_rmse, compute_mae, compute_mse])
+@pytest.mark.parametrize(
+    "y_true, y_pred",
+    [(1.0, 2.0), (np.float64(1.0), 2.0), (np.array(1.0), np.array(2.0))],
+)
+def test_compute_metrics_scalar(func, y_true, y_pred):
+    assert func(y_true, y_pred) == 1.0
+
+
 # compute_van_rossum_distance tests
 
 
-@patch("elephant.spike_train_dissimilarity.van_rossum_distance")
-def test_compute_van_rossum_distance_empty(mock_vrd, sample_data):
+def test_compute_van_rossum_distance_empty(sample_data):
     time = sample_data["time"]
-    mock_vrd.return_value = np.array([[0, 0]])
     result = compute_van_rossum_distance(np.array([]), np.array([]), time)
     assert result == 0
 
 
-@patch("elephant.spike_train_dissimilarity.van_rossum_distance")
-def test_compute_van_rossum_distance_identical(mock_vrd, sample_data):
+def test_compute_van_rossum_distance_identical(sample_data):
     y = np.array([0, 1, 0, 1, 0])
     time = sample_data["time"]
-    mock_vrd.return_value = np.array([[0, 0]])
     result = compute_van_rossum_distance(y, y, time)
     assert result == 0
+    assert type(result) is float
+
+
+@pytest.mark.parametrize("tau", [0.0, 0.5, 1.0, 5.0, np.inf])
+def test_compute_van_rossum_distance_elephant(tau):
+    time = np.linspace(0, 20, 2001)
+    y_true = np.sin(3 * time) * 60 - 20
+    y_pred = np.sin(2 * time + 0.3) * 60 - 20
+
+    spike_trains = [
+        SpikeTrain(extract_spike_times(y, time) * quant.s, t_stop=20 * quant.s)
+        for y in (y_true, y_pred)
+    ]
+    expected = van_rossum_distance(spike_trains, tau * quant.s)[0, 1]
+
+    result = compute_van_rossum_distance(y_true, y_pred, time, tau)
+    assert result == pytest.approx(expected, rel=1e-12)
 
 
 # compute_comparison tests
@@ -125,6 +173,148 @@ def test_compute_comparison_vrd_missing_time(sample_data):
         compute_comparison(y_true, y_pred, "vrd")
 
 
+@pytest.mark.parametrize("metric", ["rmse", "mae", "mse"])
+def test_compute_comparison_without_time(metric, sample_data):
+    y_true, y_pred = sample_data["simple"]
+    assert compute_comparison(y_true, y_pred, metric) == compute_comparison(
+        y_true, y_pred, metric, time=sample_data["time"])
+
+
+# compute_comparison_batch tests
+
+
+@pytest.mark.parametrize("metric", ["rmse", "mae", "mse", "vrd"])
+def test_compute_comparison_batch(metric, sample_data):
+    y_true, y_pred = sample_data["spike_train"]
+    time = sample_data["time"]
+    batch_true = np.stack([y_true, y_pred, y_true])
+    batch_pred = np.stack([y_pred, y_pred, y_true[::-1]])
+
+    result = compute_comparison_batch(
+        batch_true, batch_pred, metric, time=time)
+
+    expected = [
+        compute_comparison(a, b, metric, time=time)
+        for a, b in zip(batch_true, batch_pred)
+    ]
+    np.testing.assert_allclose(result, expected)
+
+
+def test_compute_comparison_batch_reference(sample_data):
+    y_true, y_pred = sample_data["simple"]
+    result = compute_comparison_batch(
+        np.stack([y_true, y_pred]), y_true, "mse")
+    np.testing.assert_allclose(result, [0.0, 1.0])
+
+
+@pytest.mark.parametrize("metric", ["rmse", "mse"])
+def test_compute_comparison_batch_float32(metric):
+    rng = np.random.default_rng(0)
+    y_true = rng.standard_normal((2, 2_000_000)).astype(np.float32)
+    y_pred = rng.standard_normal((2, 2_000_000)).astype(np.float32)
+
+    result = compute_comparison_batch(y_true, y_pred, metric)
+
+    # Long single precision rows give the same result as the scalar metric
+    expected = [
+        compute_comparison(a, b, metric) for a, b in zip(y_true, y_pred)
+    ]
+    np.testing.assert_allclose(result, expected, rtol=1e-5)
+
+
+def test_compute_comparison_batch_invalid(sample_data):
+    y_true, y_pred = sample_data["simple"]
+    with pytest.raises(ValueError, match="invalid metric"):
+        compute_comparison_batch(y_true, y_pred, "invalid")
+
+
+# compute_vrd_batch tests
+
+
+def test_compute_vrd_batch(sample_data):
+    y_true, y_pred = sample_data["spike_train"]
+    time = sample_data["time"]
+    batch_pred = np.stack([y_pred, y_true, y_pred[::-1]])
+
+    with patch(
+        "symprobe.utils.extract_spike_times",
+        wraps=symprobe.utils.extract_spike_times,
+    ) as mock_extract:
+        result = compute_vrd_batch(y_true, batch_pred, time)
+
+    # Reference spike train only extracted once
+    assert mock_extract.call_count == 4
+    expected = [
+        compute_van_rossum_distance(y_true, y, time) for y in batch_pred
+    ]
+    np.testing.assert_allclose(result, expected)
+
+
+def test_compute_vrd_batch_invalid(sample_data):
+    y_true, y_pred = sample_data["spike_train"]
+    with pytest.raises(ValueError, match="time array should be 1D"):
+        compute_vrd_batch(y_true, y_pred, None)
+    with pytest.raises(ValueError):
+        compute_vrd_batch(
+            np.stack([y_true, y_pred]),
+            np.stack([y_true, y_pred, y_true]),
+            sample_data["time"],
+        )
+
+
+# compute_vrd_matrix tests
+
+
+@pytest.mark.parametrize("tau", [0.0, 1.0, np.inf])
+def test_compute_vrd_matrix(tau):
+    time = np.linspace(0, 20, 501)
+    y_true = np.stack([np.sin(k * time) * 60 - 20 for k in (1, 2)])
+    y_pred = np.stack([np.sin(k * time + 0.3) * 60 - 20 for k in (1, 2, 3)])
+
+    result = compute_vrd_matrix(y_true, y_pred, time, tau)
+
+    expected = [
+        [compute_van_rossum_distance(a, b, time, tau) for b in y_pred]
+        for a in y_true
+    ]
+    assert result.shape == (2, 3)
+    np.testing.assert_allclose(result, expected)
+    np.testing.assert_allclose(
+        compute_comparison_matrix(y_true, y_pred, "vrd", tau, time), expected
+    )
+
+
+def test_compute_vrd_matrix_invalid(sample_data):
+    y_true, y_pred = sample_data["spike_train"]
+    with pytest.raises(ValueError, match="time array should be 1D"):
+        compute_vrd_matrix(y_true, y_pred, None)
+
+
+# compute_comparison_matrix tests
+
+
+@pytest.mark.parametrize("metric", ["rmse", "mae", "mse"])
+def test_compute_comparison_matrix(metric):
+    rng = np.random.default_rng(0)
+    y_true = rng.normal(-60, 20, (3, 50))
+    y_pred = rng.normal(-60, 20, (4, 50))
+
+    result = compute_comparison_matrix(y_true, y_pred, metric)
+
+    expected = [
+        [compute_comparison(a, b, metric) for b in y_pred] for a in y_true
+    ]
+    assert result.shape == (3, 4)
+    np.testing.assert_allclose(result, expected, rtol=1e-10)
+
+
+def test_compute_comparison_matrix_invalid():
+    with pytest.raises(ValueError, match="rows should have the same length"):
+        compute_comparison_matrix(np.zeros((2, 3)), np.zeros((2, 4)), "rmse")
+    with pytest.raises(ValueError, match="invalid metric"):
+        compute_comparison_matrix(np.zeros((2, 3)), np.zeros((2, 3)), "x")
+
+
 # Error handling tests
 
 
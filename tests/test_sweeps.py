@@ -9,6 +9,7 @@ Date: 03/25
 
 This file contains test cases for the functions:
 - modify_config
+- modify_config_many
 - get_config_dir,
 - get_dim_config
 - get_cell_config
@@ -22,9 +23,13 @@ and edge cases.
 
 import pytest
 import os
+import shutil
+import subprocess
+from unittest.mock import patch
 
 from symprobe.sweeps import (
     modify_config,
+    modify_config_many,
     get_config_dir,
     get_dim_config,
     get_cell_config,
@@ -33,10 +38,10 @@ from symprobe.sweeps import (
     estrus_sweep,
 )
 
-from symprobe.constants import CONFIG_ENV_VAR
+from symprobe.constants import CONFIG_ENV_VAR, ESTRUS
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def config_files():
     return {
         "2d": "tests/2d_params.toml",
@@ -65,6 +70,52 @@ def test_modify_config(config_files, mesh, param, value):
     assert f"{param} =" in content
 
 
+def test_modify_config_assignment(tmp_path):
+    config_file = tmp_path / "params.toml"
+    config_file.write_text(
+        'save_dir = "monodomain/gcal"\n[parameters]\n   gcal = 0.7 # 0.6\n'
+    )
+    modify_config(str(config_file), "gcal", 0.8)
+
+    assert config_file.read_text() == (
+        'save_dir = "monodomain/gcal"\n[parameters]\n   gcal = 0.8 \n'
+    )
+
+
+def test_modify_config_many(tmp_path):
+    config_file = tmp_path / "params.toml"
+    config_file.write_text(
+        'mesh_name = "mesh"\nestrus = "estrus"\n[parameters]\n   gna = 0.1\n'
+    )
+    modify_config_many(
+        str(config_file),
+        {"mesh_name": "mesh_2", "estrus": "diestrus", "gna": 0.2},
+    )
+
+    assert config_file.read_text() == (
+        'mesh_name = "mesh_2"\nestrus = "diestrus"\n[parameters]\n'
+        "   gna = 0.2 \n"
+    )
+
+
+def test_modify_config_many_not_found(tmp_path):
+    config_file = tmp_path / "params.toml"
+    content = 'mesh_name = "mesh"\n'
+    config_file.write_text(content)
+
+    with pytest.raises(ValueError, match="'gna' was not found"):
+        modify_config_many(str(config_file), {"mesh_name": "m", "gna": 0.2})
+    assert config_file.read_text() == content
+
+
+def test_modify_config_not_found(tmp_path):
+    config_file = tmp_path / "params.toml"
+    config_file.write_text('save_dir = "monodomain/gcal"\n')
+
+    with pytest.raises(ValueError, match="'gcal' was not found"):
+        modify_config(str(config_file), "gcal", 0.8)
+
+
 def test_get_config_dir():
     config_dir = get_config_dir()
     assert config_dir == os.getenv(CONFIG_ENV_VAR)
@@ -83,6 +134,39 @@ def test_get_cell_config(config_files, dim):
     assert os.path.exists(cell_config_file)
 
 
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        ('# Roesler estrus cells\ncell_type = "Roesler"\nestrus = "estrus"\n',
+         os.path.join("estrus", "Roesler_estrus.toml")),
+        ('cell_type = "Means"\n', os.path.join("cell", "Means.toml")),
+    ],
+)
+def test_get_cell_config_content(tmp_path, monkeypatch, content, expected):
+    monkeypatch.setenv(CONFIG_ENV_VAR, str(tmp_path))
+    dim_config_file = tmp_path / "2d_params.toml"
+    dim_config_file.write_text(content)
+
+    cell_config_file = get_cell_config(str(dim_config_file))
+    assert cell_config_file == os.path.join(str(tmp_path), expected)
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        ('estrus = "estrus"\n', "cell_type not found"),
+        ('cell_type = "Roesler"\n', "estrus not found"),
+    ],
+)
+def test_get_cell_config_invalid(tmp_path, monkeypatch, content, message):
+    monkeypatch.setenv(CONFIG_ENV_VAR, str(tmp_path))
+    dim_config_file = tmp_path / "2d_params.toml"
+    dim_config_file.write_text(content)
+
+    with pytest.raises(ValueError, match=message):
+        get_cell_config(str(dim_config_file))
+
+
 @pytest.mark.parametrize(
     "dim,mesh_name,start_val,end_val", [(2, "mesh", 1, 2), (3, "mesh3d", 2, 3)]
 )
@@ -104,3 +188,67 @@ def test_parameter_sweep(config_files, dim, param, start_val, end_val, step):
 @pytest.mark.parametrize("dim", [2, 3])
 def test_estrus_sweep(config_files, dim):
     estrus_sweep(dim)
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    (tmp_path / "general").mkdir()
+    shutil.copy("tests/2d_params.toml", tmp_path / "general")
+    monkeypatch.setenv(CONFIG_ENV_VAR, str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_estrus_sweep_workers(config_dir, max_workers):
+    stages = []
+
+    def run(args, env=None, check=False):
+        # Read the configuration used by the simulation
+        run_dir = (env or os.environ)[CONFIG_ENV_VAR]
+        with open(os.path.join(run_dir, "general", "2d_params.toml")) as f:
+            stages.append(f.read().split('estrus = "')[1].split('"')[0])
+
+    with patch("symprobe.sweeps.subprocess.run", side_effect=run) as mock:
+        estrus_sweep(2, max_workers=max_workers)
+
+    assert mock.call_count == len(ESTRUS)
+    assert sorted(stages) == sorted(ESTRUS)
+
+
+def test_estrus_sweep_workers_config_copy(config_dir):
+    config_file = config_dir / "general" / "2d_params.toml"
+    content = config_file.read_text()
+
+    with patch("symprobe.sweeps.subprocess.run") as mock:
+        estrus_sweep(2, max_workers=4)
+
+    # Each run uses its own configuration directory
+    run_dirs = {call.kwargs["env"][CONFIG_ENV_VAR]
+                for call in mock.call_args_list}
+    assert len(run_dirs) == len(ESTRUS)
+    assert str(config_dir) not in run_dirs
+    assert config_file.read_text() == content
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_estrus_sweep_workers_failure(config_dir, monkeypatch, max_workers):
+    # Stub simulation that always fails
+    bin_dir = config_dir / "bin"
+    bin_dir.mkdir()
+    stub = bin_dir / "uterine-simulation"
+    runs = config_dir / "runs.txt"
+    stub.write_text(f"#!/bin/sh\necho run >> {runs}\nexit 1\n")
+    stub.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        estrus_sweep(2, max_workers=max_workers)
+
+    # A serial sweep stops at the first failed run
+    if max_workers == 1:
+        assert len(runs.read_text().splitlines()) == 1
+
+
+def test_estrus_sweep_workers_invalid(config_dir):
+    with pytest.raises(ValueError, match="max_workers should be at least 1"):
+        estrus_sweep(2, max_workers=0)
@@ -12,8 +12,13 @@ This file contains test cases for the functions:
 - get_mesh_name
 - get_param_value
 - load_data
+- is_cache_valid
+- get_cache_key
+- save_cache
+- save_data
 - get_range
 - extract_spike_times
+- get_first_spike_idx
 - create_spike_train
 - estimate_velocity
 
@@ -21,17 +26,24 @@ The tests cover various scenarios including valid inputs, invalid inputs,
 and edge cases.
 """
 
+import os
 import pytest
 import numpy as np
 import pandas as pd
 from unittest.mock import mock_open, patch
 from symprobe.utils import (
+    _read_cached_file,
     get_print_timestep,
     get_mesh_name,
     get_param_value,
     load_data,
+    is_cache_valid,
+    get_cache_key,
+    save_cache,
+    save_data,
     get_range,
     extract_spike_times,
+    get_first_spike_idx,
     create_spike_train,
     estimate_velocity,
 )
@@ -39,7 +51,12 @@ from neo.core import SpikeTrain
 import quantities as quant
 
 
-@pytest.fixture
+@pytest.fixture(autouse=True)
+def clear_log_cache():
+    _read_cached_file.cache_clear()
+
+
+@pytest.fixture(scope="session")
 def mock_log_file():
     return """
     Simulation log
@@ -71,6 +88,19 @@ def test_get_mesh_name_file_not_found(mock_file):
         get_mesh_name("missing.txt")
 
 
+def test_get_mesh_name_log_changed(tmp_path, mock_log_file):
+    log_path = tmp_path / "log.txt"
+    log_path.write_text(mock_log_file)
+    os.utime(log_path, ns=(0, 0))
+
+    assert get_mesh_name(str(log_path)) == "test_mesh"
+    assert get_print_timestep(str(log_path)) == 0.1
+    assert _read_cached_file.cache_info().currsize == 1
+
+    log_path.write_text("mesh: other_mesh\n")
+    assert get_mesh_name(str(log_path)) == "other_mesh"
+
+
 @patch("builtins.open", new_callable=mock_open, read_data="param1: 2.5\n")
 def test_get_param_value(mock_file):
     assert get_param_value("log.txt", "param1") == 2.5
@@ -101,14 +131,248 @@ def test_load_data(mock_read_csv, mock_log_file):
     assert len(cell_ids) == 3
 
 
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@patch("pandas.read_csv")
+def test_load_data_dtype(mock_read_csv, dtype, mock_log_file):
+    mock_read_csv.return_value = pd.DataFrame(
+        {
+            "Time": [0, 0, 1, 1],
+            "V": [10.5, -40.5, 11.5, -41.5],
+            "vtkOriginalPointIds": [0, 1, 0, 1],
+        }
+    )
+
+    with patch(
+        "builtins.open", new_callable=mock_open, read_data=mock_log_file
+    ):
+        V, _, _ = load_data("data.csv", "log.txt", dtype=dtype)
+
+    assert V.dtype == dtype
+    np.testing.assert_array_equal(V, [[10.5, -40.5], [11.5, -41.5]])
+
+
+def test_load_data_chunked(tmp_path, mock_log_file):
+    data_path = tmp_path / "data.csv"
+    log_path = tmp_path / "log.txt"
+    pd.DataFrame(
+        {
+            "Time": np.repeat(np.arange(5), 3),
+            "V": np.arange(15, dtype=float),
+            "vtkOriginalPointIds": np.tile([30, 10, 20], 5),
+            "Points:0": np.zeros(15),
+        }
+    ).to_csv(data_path, index=False)
+    log_path.write_text(mock_log_file)
+
+    V, t, cell_ids = load_data(str(data_path), str(log_path))
+    V_chunk, t_chunk, cell_ids_chunk = load_data(
+        str(data_path), str(log_path), chunksize=4)
+
+    np.testing.assert_array_equal(V_chunk, V)
+    np.testing.assert_array_equal(t_chunk, t)
+    np.testing.assert_array_equal(cell_ids_chunk, cell_ids)
+
+    # The ids do not keep the point id column alive
+    assert cell_ids.base is None
+    assert cell_ids_chunk.base is None
+
+
+@pytest.mark.parametrize("chunksize", [None, 2])
+@pytest.mark.parametrize(
+    "nb_timesteps, expected_V",
+    [
+        (2, [[10.0, -40.0, 30.0], [11.0, -41.0, 29.0]]),
+        (1, [[10.0, -40.0, 30.0]]),
+    ],
+)
+def test_load_data_cell_order(
+    tmp_path, mock_log_file, chunksize, nb_timesteps, expected_V
+):
+    data_path = tmp_path / "data.csv"
+    log_path = tmp_path / "log.txt"
+    pd.DataFrame(
+        {
+            "Time": np.repeat(np.arange(nb_timesteps), 3),
+            "V": [10, -40, 30, 11, -41, 29][: 3 * nb_timesteps],
+            "vtkOriginalPointIds": np.tile([30, 10, 20], nb_timesteps),
+        }
+    ).to_csv(data_path, index=False)
+    log_path.write_text(mock_log_file)
+
+    V, _, cell_ids = load_data(
+        str(data_path), str(log_path), chunksize=chunksize)
+
+    # Cell ids follow the columns of V, not the sorted order
+    np.testing.assert_array_equal(cell_ids, [30, 10, 20])
+    np.testing.assert_array_equal(V, expected_V)
+
+
+@pytest.mark.parametrize(
+    "point_ids",
+    [[30, 30, 10, 10, 20, 20], [30, 10, 10, 30, 20, 20]],
+)
+def test_load_data_not_interleaved(tmp_path, mock_log_file, point_ids):
+    data_path = tmp_path / "data.csv"
+    log_path = tmp_path / "log.txt"
+    values = {30: [10, 11], 10: [-40, -41], 20: [30, 29]}
+    V_column = [values[i].pop(0) for i in point_ids]
+    pd.DataFrame(
+        {
+            "Time": np.zeros(6),
+            "V": V_column,
+            "vtkOriginalPointIds": point_ids,
+        }
+    ).to_csv(data_path, index=False)
+    log_path.write_text(mock_log_file)
+
+    V, t, cell_ids = load_data(str(data_path), str(log_path))
+
+    np.testing.assert_array_equal(cell_ids, [30, 10, 20])
+    np.testing.assert_array_equal(V, [[10, -40, 30], [11, -41, 29]])
+    assert len(t) == 2
+
+    # The first id does not repeat in the first chunk of size 2
+    for chunksize in (2, 4):
+        with pytest.raises(ValueError, match="rows are not interleaved"):
+            load_data(str(data_path), str(log_path), chunksize=chunksize)
+
+
+def test_load_data_uneven_cells(tmp_path, mock_log_file):
+    data_path = tmp_path / "data.csv"
+    log_path = tmp_path / "log.txt"
+    pd.DataFrame(
+        {
+            "Time": np.zeros(4),
+            "V": np.zeros(4),
+            "vtkOriginalPointIds": [1, 1, 1, 2],
+        }
+    ).to_csv(data_path, index=False)
+    log_path.write_text(mock_log_file)
+
+    with pytest.raises(ValueError, match="same number of timesteps"):
+        load_data(str(data_path), str(log_path))
+
+
+@pytest.mark.parametrize(
+    "header, error",
+    [("Time,V", IndexError), ("Time,V,Points:0", ValueError)],
+)
+def test_load_data_invalid_columns(tmp_path, header, error):
+    data_path = tmp_path / "data.csv"
+    data_path.write_text(header + "\n")
+
+    with pytest.raises(error):
+        load_data(str(data_path), "log.txt")
+
+
+def test_is_cache_valid(tmp_path):
+    source = tmp_path / "data.csv"
+    cache = tmp_path / "data.npz"
+    source.write_text("")
+    cache.write_text("")
+    os.utime(source, (0, 0))
+
+    assert is_cache_valid(str(cache), str(source))
+
+    os.utime(source, None)
+    os.utime(cache, (0, 0))
+    assert not is_cache_valid(str(cache), str(source))
+
+
+def test_is_cache_valid_missing(tmp_path):
+    assert not is_cache_valid(str(tmp_path / "data.npz"))
+
+
+def test_get_cache_key(tmp_path):
+    source = tmp_path / "data.csv"
+    source.write_text("1,2")
+    key = get_cache_key(str(source))
+
+    source.write_text("1,2,3")
+    os.utime(source, ns=(key[0, 0], key[0, 0]))
+
+    assert key.shape == (1, 2)
+    assert not np.array_equal(key, get_cache_key(str(source)))
+
+
+def test_get_cache_key_missing(tmp_path):
+    with pytest.raises(OSError):
+        get_cache_key(str(tmp_path / "data.csv"))
+
+
+def test_save_cache(tmp_path):
+    cache = tmp_path / "data.npz"
+    V = np.array([[1.0, 2.0], [3.0, 4.0]])
+
+    save_cache(str(cache), V=V)
+
+    with np.load(cache) as data:
+        np.testing.assert_array_equal(data["V"], V)
+    assert not os.path.exists(str(cache) + ".tmp")
+
+
+def test_save_cache_npy(tmp_path):
+    cache = tmp_path / "data.npy"
+    V = np.array([[1.0, 2.0], [3.0, 4.0]])
+
+    save_cache(str(cache), V=V)
+    data = np.load(cache, mmap_mode="r")
+
+    np.testing.assert_array_equal(data, V)
+    assert not data.flags.writeable
+
+
+def test_save_cache_npy_invalid(tmp_path):
+    with pytest.raises(ValueError, match="can only contain one array"):
+        save_cache(str(tmp_path / "data.npy"),
+                   V=np.zeros(2), t=np.zeros(2))
+
+
+def test_save_data(tmp_path):
+    data_path = str(tmp_path / "data.npz")
+    V = np.array([[10.0, -40.0, 30.0], [11.0, -41.0, 29.0]])
+    t = np.array([0.0, 0.1])
+    save_data(data_path, V, t, np.array([30, 10, 20]))
+
+    V_load, t_load, cell_ids = load_data(data_path, "missing.log")
+
+    assert V_load.dtype == np.float32
+    np.testing.assert_array_equal(V_load, V)
+    np.testing.assert_array_equal(t_load, t)
+    np.testing.assert_array_equal(cell_ids, [30, 10, 20])
+
+
+def test_save_data_invalid(tmp_path):
+    with pytest.raises(ValueError, match="should end with .npz"):
+        save_data(str(tmp_path / "data.csv"),
+                  np.zeros((1, 1)), np.zeros(1), np.zeros(1))
+
+    data_path = str(tmp_path / "data.npz")
+    np.savez(data_path, V=np.zeros((1, 1)))
+    with pytest.raises(ValueError, match="missing array t"):
+        load_data(data_path, "missing.log")
+
+
 @pytest.mark.parametrize(
     "num_range, expected",
-    [(["5"], 5), (["1-3"], [1, 2, 3]), (["2", "4", "6"], [2, 4, 6])],
+    [
+        (["5"], 5),
+        (["1-3"], range(1, 4)),
+        (["2", "4", "6"], [2, 4, 6]),
+        ("12", 12),
+        ("10-12", range(10, 13)),
+    ],
 )
 def test_get_range(num_range, expected):
     assert get_range(num_range) == expected
 
 
+@pytest.mark.parametrize("num_range", [["a"], ["1-"], ["-3"], ["1-2-3"]])
+def test_get_range_invalid(num_range):
+    with pytest.raises(ValueError, match="invalid range"):
+        get_range(num_range)
+
+
 @pytest.mark.parametrize(
     "signal, time, height, expected",
     [
@@ -128,6 +392,19 @@ def test_create_spike_train():
     assert spike_train.t_stop == 2.0 * quant.s
 
 
+@pytest.mark.parametrize("window", [1, 4, 1024])
+def test_get_first_spike_idx(window):
+    t = np.linspace(0, 10, 200)
+    signal = np.round(np.sin(3 * t) * 60 - 20)
+
+    idx = get_first_spike_idx(signal, window=window)
+    assert t[idx] == extract_spike_times(signal, t)[0]
+
+
+def test_get_first_spike_idx_no_spike():
+    assert get_first_spike_idx(np.full(100, -70.0), window=4) == -1
+
+
 def test_estimate_velocity():
     V = np.array([[-70, -50, -30], [-70, -50, 30], [-70, 50, 30]])
     t = np.array([0, 1, 2])